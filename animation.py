@@ -0,0 +1,165 @@
+import asyncio
+import time
+
+from outbox import MESSAGE_LIMIT
+
+
+class TokenBucket:
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, reserve=0):
+        # Seconds until a token is available without dipping into `reserve`.
+        self.refill()
+        return max(0.0, (1 + reserve - self.tokens) / self.rate)
+
+    def take(self):
+        self.tokens -= 1
+
+
+def sequence(frames, duration):
+    # Frame renderer for a fixed list of frames played over `duration`
+    # seconds; the last frame is the final one.
+    def render(elapsed):
+        index = int(elapsed / duration * (len(frames) - 1)) if duration else len(frames) - 1
+        return frames[min(index, len(frames) - 1)]
+    return render
+
+
+class Animation:
+    def __init__(self, label, render, duration):
+        self.label = label
+        self.render = render
+        self.duration = duration
+        self.started = time.monotonic()
+        self.ends = self.started + duration
+        self.frame = None
+        self.done = asyncio.get_running_loop().create_future()
+
+
+class Stage:
+    # One animated message per channel. Every animation running in the
+    # channel is drawn onto it, so concurrent spins share each edit. A game
+    # that owns its message gets a stage of its own for that message.
+
+    def __init__(self, key, channel, bucket, message=None):
+        self.key = key
+        self.channel = channel
+        self.bucket = bucket
+        self.message = message
+        self.content = message.content if message is not None else None
+        self.animations = []
+        self.finished = []
+        self.last_edit = 0.0
+
+    def render(self, now):
+        for animation in self.animations:
+            animation.frame = animation.render(min(now - animation.started, animation.duration))
+        while True:
+            shown = self.finished + self.animations
+            if len(shown) == 1:
+                content = shown[0].frame
+            else:
+                content = '\n'.join(f'{animation.label}: {animation.frame}' for animation in shown)
+            # Finished results make way for running ones once the message is full.
+            if len(content) <= MESSAGE_LIMIT or not self.finished:
+                return content[:MESSAGE_LIMIT]
+            del self.finished[0]
+
+
+class AnimationScheduler:
+    # Plays message animations within Discord's edit budgets: a token bucket
+    # per channel and one shared by every channel. Frames are picked by
+    # elapsed time, so when the budget is tight frames are skipped rather
+    # than delayed, and the last token is always kept for a final frame.
+    # The channel defaults allow at most 2 + 0.6 * 5 = 5 requests in any five
+    # seconds, Discord's per-channel budget.
+
+    def __init__(self, channel_capacity=2, channel_rate=0.6, global_rate=50.0, cadence=0.5):
+        self.channel_capacity = channel_capacity
+        self.channel_rate = channel_rate
+        self.cadence = cadence
+        self.bucket = TokenBucket(global_rate, global_rate)
+        self.channel_buckets = {}
+        self.stages = {}
+        # Running stage tasks; the event loop only keeps weak references.
+        self.tasks = set()
+
+    def channel_bucket(self, channel_id):
+        # Also used by the outbox, so messages and animations share a budget.
+        bucket = self.channel_buckets.get(channel_id)
+        if bucket is None:
+            bucket = self.channel_buckets[channel_id] = TokenBucket(self.channel_capacity, self.channel_rate)
+        return bucket
+
+    async def play(self, channel, label, render, duration, message=None):
+        animation = Animation(label, render, duration)
+        key = channel.id if message is None else (channel.id, message.id)
+        stage = self.stages.get(key)
+        if stage is None:
+            stage = self.stages[key] = Stage(key, channel, self.channel_bucket(channel.id), message)
+            stage.animations.append(animation)
+            task = asyncio.create_task(self.run(stage))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        else:
+            stage.animations.append(animation)
+        await animation.done
+        return animation.frame
+
+    async def run(self, stage):
+        try:
+            while stage.animations:
+                now = time.monotonic()
+                due = min(animation.ends for animation in stage.animations)
+                final = now >= due
+                reserve = 0 if final else 1
+                delay = max(stage.bucket.delay(reserve), self.bucket.delay(reserve))
+                if not final:
+                    delay = min(max(delay, stage.last_edit + self.cadence - now), due - now)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+
+                content = stage.render(now)
+                if content != stage.content:
+                    stage.bucket.take()
+                    self.bucket.take()
+                    if stage.message is None:
+                        stage.message = await stage.channel.send(content)
+                    else:
+                        await stage.message.edit(content=content)
+                    stage.content = content
+                stage.last_edit = now
+
+                for animation in [animation for animation in stage.animations if animation.ends <= now]:
+                    stage.animations.remove(animation)
+                    stage.finished.append(animation)
+                    animation.done.set_result(None)
+        except Exception as error:
+            print(f'Animation in channel {stage.channel.id} failed: {error!r}')
+        finally:
+            # Never leave a game waiting on an animation that will not finish.
+            for animation in stage.animations:
+                if not animation.done.done():
+                    animation.done.set_result(None)
+            del self.stages[stage.key]
+            self.prune()
+
+    def prune(self):
+        # A bucket that has refilled completely carries no history, so it can
+        # be dropped and recreated full on the next animation.
+        if len(self.channel_buckets) < 256:
+            return
+        for channel_id, bucket in list(self.channel_buckets.items()):
+            bucket.refill()
+            if bucket.tokens >= bucket.capacity and not any(stage.channel.id == channel_id for stage in self.stages.values()):
+                del self.channel_buckets[channel_id]
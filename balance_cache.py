@@ -0,0 +1,259 @@
+import asyncio
+import glob
+import json
+import os
+import time
+from collections import OrderedDict
+
+from ledger import BALANCES_SQL, BULK_CHUNK, InsufficientFunds
+
+
+FLUSH_SQL = 'INSERT OR REPLACE INTO balances (user_id, balance) VALUES (?, ?)'
+FLUSHED_SQL = 'INSERT OR REPLACE INTO journal_state (journal, segment) VALUES (?, ?)'
+
+
+class BalanceCache:
+    # In-memory, authoritative copy of the balances table. Mutations are
+    # applied here synchronously, appended to a journal and written back to
+    # SQLite in batched group commits, along with any statements committed
+    # in the same ledger transactions. The journal is split into numbered
+    # segments so a flush can drop exactly the records it made durable, and
+    # any segments left behind by a crash are replayed by start(). Each
+    # flush records its last segment in journal_state in the same commit,
+    # so a segment that was flushed but not yet deleted is never replayed
+    # and every statement is applied exactly once.
+
+    def __init__(self, storage, journal_path, capacity=50000, flush_interval=1.0, flush_threshold=500):
+        self.storage = storage
+        self.journal_path = journal_path
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.entries = OrderedDict()
+        self.dirty = set()
+        self.flushing = set()
+        self.pinned = set()
+        self.statements = []
+        self.segment = 0
+        self.journal_fd = None
+        self.flush_requested = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self.flusher = None
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def segment_path(self, segment):
+        return f'{self.journal_path}.{segment}'
+
+    def segments(self):
+        found = []
+        for path in glob.glob(glob.escape(self.journal_path) + '.*'):
+            suffix = path.rsplit('.', 1)[1]
+            if suffix.isdigit():
+                found.append(int(suffix))
+        return sorted(found)
+
+    async def start(self):
+        await self.replay()
+        self.open_segment(self.segment + 1)
+        self.flusher = asyncio.create_task(self.flush_loop())
+
+    async def close(self):
+        if self.flusher is not None:
+            self.flusher.cancel()
+            try:
+                await self.flusher
+            except asyncio.CancelledError:
+                pass
+            self.flusher = None
+        await self.flush()
+        if self.journal_fd is not None:
+            os.close(self.journal_fd)
+            self.journal_fd = None
+            os.remove(self.segment_path(self.segment))
+
+    async def flushed_segment(self):
+        row = await self.storage.fetchone('SELECT segment FROM journal_state WHERE journal = ?', (self.journal_path,))
+        return row[0] if row else 0
+
+    async def replay(self):
+        flushed = await self.flushed_segment()
+        self.segment = flushed
+        segments = self.segments()
+        for segment in segments:
+            if segment <= flushed:
+                os.remove(self.segment_path(segment))
+        segments = [segment for segment in segments if segment > flushed]
+        if not segments:
+            return
+        balances = {}
+        statements = []
+        for segment in segments:
+            with open(self.segment_path(segment), encoding='ascii') as journal:
+                for line in journal:
+                    # A record without its newline was cut short by a crash.
+                    if not line.endswith('\n'):
+                        break
+                    legs, _, extra = line.partition('\t')
+                    for leg in legs.split():
+                        user_id, balance = leg.split(':')
+                        balances[int(user_id)] = int(balance)
+                    if extra:
+                        statements.extend(json.loads(extra))
+        async with self.storage.lock:
+            await self.storage.db.executemany(FLUSH_SQL, balances.items())
+            for sql, params in statements:
+                await self.storage.db.execute(sql, params)
+            await self.storage.db.execute(FLUSHED_SQL, (self.journal_path, segments[-1]))
+            await self.storage.db.commit()
+        for segment in segments:
+            os.remove(self.segment_path(segment))
+        self.segment = segments[-1]
+
+    def open_segment(self, segment):
+        self.segment = segment
+        self.journal_fd = os.open(self.segment_path(segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+
+    def journal(self, balances, statements=()):
+        # One write per transaction, so a record is either replayed whole or
+        # not at all. os.write bypasses Python buffering, which makes the
+        # record survive a crash of the bot process.
+        record = ' '.join(f'{user_id}:{balance}' for user_id, balance in balances.items())
+        if statements:
+            record += '\t' + json.dumps(statements)
+        record += '\n'
+        os.write(self.journal_fd, record.encode('ascii'))
+
+    async def load(self, user_ids):
+        for user_id in user_ids:
+            if user_id in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(user_id)
+                continue
+            self.misses += 1
+            balance = await self.storage.get_balance(user_id) or 0
+            # Another coroutine may have loaded and changed it while we waited.
+            if user_id not in self.entries:
+                self.entries[user_id] = balance
+
+    async def load_many(self, user_ids, progress=None):
+        # Loads the missing balances BULK_CHUNK to a query, for bulk
+        # transactions. They stay pinned against eviction until unpin(), so
+        # a load this size is not undone by other commands evicting behind
+        # it; one bulk load runs at a time.
+        self.pinned.update(user_ids)
+        missing = [user_id for user_id in user_ids if user_id not in self.entries]
+        self.hits += len(user_ids) - len(missing)
+        self.misses += len(missing)
+        for start in range(0, len(missing), BULK_CHUNK):
+            part = missing[start:start + BULK_CHUNK]
+            rows = dict(await self.storage.fetchall(BALANCES_SQL, (json.dumps(part),)))
+            for user_id in part:
+                if user_id not in self.entries:
+                    self.entries[user_id] = rows.get(user_id, 0)
+            if progress is not None:
+                progress(start + len(part), len(missing))
+
+    def unpin(self, user_ids):
+        self.pinned.difference_update(user_ids)
+        self.evict()
+
+    async def get(self, user_id):
+        await self.load((user_id,))
+        return self.entries[user_id]
+
+    async def apply(self, legs, statements=()):
+        user_ids = {user_id for user_id, _ in legs}
+        # Loading one user can yield long enough for another to be evicted.
+        while not user_ids.issubset(self.entries):
+            await self.load(user_ids)
+        # Everything below runs without yielding to the event loop, which makes
+        # the check-and-apply atomic with respect to other commands.
+        balances = {}
+        for user_id, delta in legs:
+            balance = balances.get(user_id, self.entries[user_id]) + delta
+            if delta < 0 and balance < 0:
+                raise InsufficientFunds(user_id, -delta)
+            balances[user_id] = balance
+        self.journal(balances, statements)
+        self.statements.extend(statements)
+        self.entries.update(balances)
+        self.dirty.update(balances)
+        if len(self.dirty) >= self.flush_threshold:
+            self.flush_requested.set()
+        self.evict()
+        return balances
+
+    def evict(self):
+        if len(self.entries) <= self.capacity:
+            return
+        for user_id in list(self.entries):
+            if len(self.entries) <= self.capacity:
+                break
+            if user_id not in self.dirty and user_id not in self.flushing and user_id not in self.pinned:
+                del self.entries[user_id]
+
+    async def flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_requested.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as error:
+                print(f'Balance cache flush failed: {error!r}')
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.dirty and not self.statements:
+                return
+            start = time.perf_counter()
+            snapshot = {user_id: self.entries[user_id] for user_id in self.dirty}
+            statements, self.statements = self.statements, []
+            self.dirty.clear()
+            self.flushing.update(snapshot)
+            # New mutations go to a fresh segment while this batch is written.
+            old_fd, old_segment = self.journal_fd, self.segment
+            self.open_segment(old_segment + 1)
+            os.close(old_fd)
+            try:
+                async with self.storage.lock:
+                    await self.storage.db.executemany(FLUSH_SQL, snapshot.items())
+                    for sql, params in statements:
+                        await self.storage.db.execute(sql, params)
+                    await self.storage.db.execute(FLUSHED_SQL, (self.journal_path, old_segment))
+                    await self.storage.db.commit()
+            except BaseException:
+                await self.storage.db.rollback()
+                self.dirty.update(snapshot)
+                self.statements[:0] = statements
+                raise
+            finally:
+                self.flushing.difference_update(snapshot)
+            for segment in self.segments():
+                if segment <= old_segment:
+                    os.remove(self.segment_path(segment))
+            elapsed = time.perf_counter() - start
+            self.flushes += 1
+            self.rows_flushed += len(snapshot)
+            self.flush_seconds += elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.evict()
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'dirty': len(self.dirty),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'flushes': self.flushes,
+            'rows_flushed': self.rows_flushed,
+            'mean_flush_ms': self.flush_seconds / self.flushes * 1000 if self.flushes else 0.0,
+            'max_flush_ms': self.max_flush_seconds * 1000,
+        }
@@ -0,0 +1,57 @@
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from blackjack_engine import DECK
+from blackjack_sessions import Hand, Session
+
+
+# The nested dicts blackjack_games held before blackjack_sessions.py existed.
+def dict_session(rng, bet):
+    return {
+        'status': 'ongoing',
+        'hands': [{'cards': [rng.choice(DECK) for _ in range(2)], 'bet': bet, 'status': 'ongoing'}],
+        'dealer_hand': [rng.choice(DECK), '?'],
+    }
+
+
+def compact_session(rng, bet, user_id):
+    return Session(user_id, [Hand([rng.choice(DECK) for _ in range(2)], bet)], [rng.choice(DECK), 0])
+
+
+def measure(build, sessions, seed):
+    rng = random.Random(seed)
+    gc.collect()
+    tracemalloc.start()
+    games = {}
+    for i in range(sessions):
+        user_id = 10 ** 17 + i
+        games[user_id] = build(rng, rng.randrange(1, 1000), user_id)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return games, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory held by concurrent blackjack sessions.')
+    parser.add_argument('--sessions', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    for name, build in (('nested dicts', lambda rng, bet, user_id: dict_session(rng, bet)),
+                        ('__slots__ + bytearray', compact_session)):
+        games, used = measure(build, args.sessions, args.seed)
+        print(f'{name:>22}: {used / 2 ** 20:8.1f} MiB  {used / args.sessions:6.0f} bytes/session')
+        del games
+
+    rng = random.Random(args.seed)
+    blob = compact_session(rng, 100, 0).pack()
+    print(f'{"stored row":>22}: {len(blob)} bytes of state per session')
+
+
+if __name__ == '__main__':
+    main()
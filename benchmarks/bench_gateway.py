@@ -0,0 +1,123 @@
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import discord
+from discord.state import ChunkRequest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gateway import client_options
+
+GUILD_ID = 10 ** 17
+FIRST_CHANNEL = GUILD_ID + 1
+FIRST_USER = 2 * 10 ** 17
+TIMESTAMP = '2024-01-01T00:00:00+00:00'
+
+
+def user(user_id):
+    return {'id': str(user_id), 'username': f'player{user_id % 10 ** 7}', 'discriminator': '0',
+            'global_name': None, 'avatar': None}
+
+
+def member(user_id):
+    return {'user': user(user_id), 'roles': [], 'nick': None, 'joined_at': TIMESTAMP,
+            'deaf': False, 'mute': False, 'flags': 0}
+
+
+def guild_create(channels, member_count):
+    # As Discord sends it for a large guild without the presences intent:
+    # metadata and channels, but no member list.
+    return {
+        'id': str(GUILD_ID), 'name': 'Casino', 'icon': None, 'owner_id': str(FIRST_USER),
+        'member_count': member_count, 'large': True, 'features': [], 'emojis': [], 'stickers': [],
+        'roles': [{'id': str(GUILD_ID), 'name': '@everyone', 'permissions': '104324673', 'position': 0,
+                   'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}],
+        'channels': [{'id': str(FIRST_CHANNEL + i), 'type': 0, 'name': f'casino-{i}', 'position': i,
+                      'permission_overwrites': []} for i in range(channels)],
+        'members': [], 'presences': [], 'voice_states': [], 'threads': [],
+    }
+
+
+def member_chunks(members, size=1000):
+    count = (members + size - 1) // size
+    for index in range(count):
+        start = FIRST_USER + index * size
+        yield index, count, [member(user_id) for user_id in range(start, min(start + size, FIRST_USER + members))]
+
+
+def message(message_id, channel_id, user_id):
+    data = member(user_id)
+    return {'id': str(message_id), 'channel_id': str(channel_id), 'guild_id': str(GUILD_ID), 'type': 0,
+            'author': data.pop('user'), 'member': data, 'content': '!slots 100', 'timestamp': TIMESTAMP,
+            'edited_timestamp': None, 'tts': False, 'mention_everyone': False, 'mentions': [],
+            'mention_roles': [], 'attachments': [], 'embeds': [], 'pinned': False}
+
+
+def reaction(message_id, channel_id, user_id):
+    return {'user_id': str(user_id), 'channel_id': str(channel_id), 'message_id': str(message_id),
+            'guild_id': str(GUILD_ID), 'member': member(user_id), 'emoji': {'id': None, 'name': '🛑'},
+            'type': 0, 'burst': False}
+
+
+async def connect(options, args):
+    # Feeds the client's connection state the events a shard would receive:
+    # the guild, the member chunks it asks for when it caches members, then
+    # a stream of commands and reactions. Only parsing and caching is timed;
+    # on a real gateway each member chunk is also a round trip.
+    client = discord.Client(**options)
+    state = client._connection
+    begin = time.perf_counter()
+    state._get_create_guild(guild_create(args.channels, args.members))
+    if state._chunk_guilds:
+        request = ChunkRequest(GUILD_ID, 0, asyncio.get_running_loop(), state._get_guild)
+        state._chunk_requests[request.nonce] = request
+        for index, count, members in member_chunks(args.members):
+            state.parse_guild_members_chunk({'guild_id': str(GUILD_ID), 'members': members, 'chunk_index': index,
+                                             'chunk_count': count, 'nonce': request.nonce})
+    ready = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    for i in range(args.messages):
+        channel_id = FIRST_CHANNEL + i % args.channels
+        user_id = FIRST_USER + i * 7919 % args.members
+        state.parse_message_create(message(GUILD_ID + 10 ** 6 + i, channel_id, user_id))
+        state.parse_message_reaction_add(reaction(GUILD_ID + 10 ** 6 + i, channel_id, user_id))
+    events = time.perf_counter() - begin
+    return client, ready, events
+
+
+async def measure(options, args):
+    gc.collect()
+    # Timed without tracemalloc, which slows allocation down several times.
+    _, ready, events = await connect(options, args)
+    gc.collect()
+    tracemalloc.start()
+    client, _, _ = await connect(options, args)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    guild = client.get_guild(GUILD_ID)
+    return ready, events, retained, len(guild.members), len(client.cached_messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gateway cache memory and startup time, default against low-memory mode.')
+    parser.add_argument('--members', type=int, default=200000)
+    parser.add_argument('--channels', type=int, default=200)
+    parser.add_argument('--messages', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f'Synthetic guild: {args.members:,} members, {args.channels} channels, '
+          f'{args.messages:,} commands with a reaction each')
+    for name, low_memory in (('default', False), ('low-memory', True)):
+        ready, events, retained, members, messages = asyncio.run(measure(client_options(low_memory), args))
+        print(f'{name:>10}: guild ready {ready * 1000:8.1f} ms, events {events * 1000:7.1f} ms, '
+              f'retained {retained / 2 ** 20:7.1f} MiB, {members:,} members and {messages:,} messages cached')
+
+
+if __name__ == '__main__':
+    main()
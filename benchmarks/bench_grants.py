@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from storage import Storage
+from ledger import Ledger
+from balance_cache import BalanceCache
+from grants import Grants
+
+FIRST_USER = 10 ** 17
+
+
+async def seed(storage, players):
+    # Half the recipients already have a balance, as in a guild where some
+    # members have never played.
+    async with storage.lock:
+        await storage.db.executemany('INSERT INTO balances (user_id, balance) VALUES (?, ?)',
+                                     ((FIRST_USER + i, 1000) for i in range(0, players, 2)))
+        await storage.db.commit()
+
+
+async def run(directory, name, recipients, loop_sample, cached):
+    storage = Storage(os.path.join(directory, f'{name}.db'))
+    await storage.open()
+    cache = BalanceCache(storage, os.path.join(directory, f'{name}.journal')) if cached else None
+    if cache is not None:
+        await cache.start()
+    ledger = Ledger(storage, cache)
+    try:
+        await seed(storage, recipients)
+        user_ids = [FIRST_USER + i for i in range(recipients)]
+
+        # One Ledger.credit per recipient, on a sample.
+        begin = time.perf_counter()
+        for user_id in user_ids[:loop_sample]:
+            await ledger.credit(user_id, 1)
+        await ledger.sync()
+        per_user = (time.perf_counter() - begin) / loop_sample
+
+        grants = Grants(storage, ledger)
+        reports = []
+        begin = time.perf_counter()
+        balances = await grants.grant('bench', user_ids, 100, 0, lambda done, total: reports.append(done))
+        granted = time.perf_counter() - begin
+        await ledger.sync()
+        durable = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        repeated = await grants.grant('bench', user_ids, 100, 0)
+        refused = time.perf_counter() - begin
+        assert repeated is None and len(balances) == recipients
+        total, = await storage.fetchone('SELECT SUM(balance) FROM balances')
+        assert total == (recipients + 1) // 2 * 1000 + loop_sample + recipients * 100
+    finally:
+        if cache is not None:
+            await cache.close()
+        await storage.close()
+
+    print(f'{name:>12}: loop of Ledger.credit {1 / per_user:9,.0f} recipients/s '
+          f'({recipients * per_user:6.1f}s for {recipients:,}, from {loop_sample:,})')
+    print(f'{"":>12}  bulk grant {recipients / granted:19,.0f} recipients/s '
+          f'({granted:6.2f}s, {durable:.2f}s including the flush, {len(reports)} progress reports)')
+    print(f'{"":>12}  repeated key refused in {refused * 1000:.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk grant throughput against crediting recipients one at a time.')
+    parser.add_argument('--recipients', type=int, default=100000)
+    parser.add_argument('--loop-sample', type=int, default=5000, help='recipients credited one at a time for the loop rate')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, cached in (('sqlite', False), ('cached', True)):
+            asyncio.run(run(directory, name, args.recipients, args.loop_sample, cached))
+
+
+if __name__ == '__main__':
+    main()
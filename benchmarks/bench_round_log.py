@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from round_log import DAY_MS, GAMES, RoundLog, dtype, house_profit_by_day, open_log
+
+
+async def write_rounds(path, rounds):
+    # Rounds recorded from the event loop, as the bot records them.
+    log = RoundLog(path)
+    await log.start()
+    begin = time.perf_counter()
+    for i in range(rounds):
+        log.record(10 ** 17 + i % 100000, 'slots', 100, 250 if i % 4 == 0 else 0, i % 343)
+        if i % 10000 == 0:
+            await asyncio.sleep(0)
+    recorded = time.perf_counter() - begin
+    await log.close()
+    return recorded, time.perf_counter() - begin
+
+
+def synthesize(path, rounds, days, seed, chunk=1 << 22):
+    # A log of `rounds` rounds spread evenly over `days` days.
+    rng = np.random.default_rng(seed)
+    start = int(time.time() * 1000) - days * DAY_MS
+    step = days * DAY_MS / rounds
+    with open(path, 'wb') as output:
+        for offset in range(0, rounds, chunk):
+            count = min(chunk, rounds - offset)
+            part = np.zeros(count, dtype=dtype())
+            part['time'] = start + (np.arange(offset, offset + count) * step).astype(np.int64)
+            part['user'] = 10 ** 17 + rng.integers(0, 1000000, count)
+            part['game'] = rng.integers(1, len(GAMES) + 1, count)
+            part['wager'] = rng.integers(1, 1000, count)
+            part['payout'] = part['wager'] * rng.choice([0, 0, 1, 2], count)
+            part['outcome'] = rng.integers(0, 343, count)
+            part.tofile(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round log write throughput and memory-mapped aggregation time.')
+    parser.add_argument('--rounds', type=int, default=100000000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--writes', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'rounds.log')
+        recorded, total = asyncio.run(write_rounds(path, args.writes))
+        print(f'Recorded {args.writes:,} rounds in {recorded:.2f}s on the event loop '
+              f'({args.writes / recorded:,.0f} rounds/s), {total:.2f}s including the final write')
+
+        os.remove(path)
+        begin = time.perf_counter()
+        synthesize(path, args.rounds, args.days, args.seed)
+        print(f'Synthesized {args.rounds:,} rounds over {args.days} days, '
+              f'{os.path.getsize(path) / 2 ** 30:.1f} GiB, in {time.perf_counter() - begin:.1f}s')
+
+        for attempt in ('first', 'second'):
+            begin = time.perf_counter()
+            totals = house_profit_by_day(open_log(path))
+            print(f'House profit per game per day, {attempt} run: {len(totals):,} rows '
+                  f'in {time.perf_counter() - begin:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
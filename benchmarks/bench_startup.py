@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import migrations
+from storage import Storage
+from rankings import Leaderboard
+
+
+class NoNames:
+    def update(self, user):
+        return False
+
+
+class NoLedger:
+    def subscribe(self, listener):
+        pass
+
+
+def populate(path, users, seed):
+    # The schema as it was before migrations existed, with no user_version.
+    rng = random.Random(seed)
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE scores (user_id INTEGER PRIMARY KEY, score INTEGER)')
+    db.execute('CREATE TABLE balances (user_id INTEGER PRIMARY KEY, balance INTEGER)')
+    db.executemany('INSERT INTO balances (user_id, balance) VALUES (?, ?)',
+                   ((10 ** 17 + i, rng.choice((0, rng.randrange(1, 10 ** 6)))) for i in range(users)))
+    db.commit()
+    db.close()
+
+
+async def start(path):
+    # Everything main() does with the database before connecting to Discord.
+    timings = {}
+    begin = time.perf_counter()
+    storage = Storage(path)
+    try:
+        await storage.open()
+        timings['open + migrate'] = time.perf_counter() - begin
+        mark = time.perf_counter()
+        leaderboard = Leaderboard(NoLedger(), storage, NoNames())
+        await leaderboard.load()
+        timings['leaderboard load'] = time.perf_counter() - mark
+        timings['total'] = time.perf_counter() - begin
+        plan = await storage.fetchall('EXPLAIN QUERY PLAN SELECT user_id, balance FROM balances WHERE balance > 0 ORDER BY balance DESC')
+        version = await migrations.schema_version(storage.db)
+    finally:
+        await storage.close()
+    return timings, version, ' '.join(row[-1] for row in plan), len(leaderboard.index)
+
+
+def report(name, timings, version, plan, ranked):
+    print(f'{name} (schema version {version}, {ranked} ranked players):')
+    for step, seconds in timings.items():
+        print(f'  {step:>16}: {seconds * 1000:9.1f} ms')
+    print(f'  {"query plan":>16}: {plan}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup time before and after the schema migrations have run.')
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'leaderboard.db')
+        populate(path, args.users, args.seed)
+        print(f'{args.users:,} users, {os.path.getsize(path) / 2 ** 20:.1f} MiB')
+        report('Fresh start, every migration runs', *asyncio.run(start(path)))
+        report('Warm start, nothing to migrate', *asyncio.run(start(path)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import aiosqlite
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from storage import Storage
+from ledger import Ledger
+from balance_cache import BalanceCache
+
+
+# The connect-per-call helpers as they were before storage.py existed.
+class ConnectPerCall:
+    def __init__(self, path):
+        self.path = path
+
+    async def get_balance(self, user_id):
+        async with aiosqlite.connect(self.path) as db:
+            cursor = await db.execute('SELECT balance FROM balances WHERE user_id = ?', (user_id,))
+            result = await cursor.fetchone()
+            await cursor.close()
+            return result[0] if result else None
+
+    async def add_balance(self, user_id, amount):
+        async with aiosqlite.connect(self.path) as db:
+            current_balance = await self.get_balance(user_id) or 0
+            await db.execute('INSERT OR REPLACE INTO balances (user_id, balance) VALUES (?, ?)', (user_id, current_balance + amount))
+            await db.commit()
+
+    async def subtract_balance(self, user_id, amount):
+        async with aiosqlite.connect(self.path) as db:
+            current_balance = await self.get_balance(user_id) or 0
+            await db.execute('INSERT OR REPLACE INTO balances (user_id, balance) VALUES (?, ?)', (user_id, current_balance - amount))
+            await db.commit()
+
+
+class SharedLedger:
+    def __init__(self, storage, cache=None):
+        self.ledger = Ledger(storage, cache)
+
+    async def get_balance(self, user_id):
+        return await self.ledger.balance(user_id)
+
+    async def add_balance(self, user_id, amount):
+        return await self.ledger.credit(user_id, amount)
+
+    async def subtract_balance(self, user_id, amount):
+        return await self.ledger.debit(user_id, amount)
+
+
+async def spin(backend, user_id):
+    # Same storage traffic as one losing-then-winning !slots command.
+    start = time.perf_counter()
+    await backend.get_balance(user_id)
+    await backend.subtract_balance(user_id, 10)
+    await backend.add_balance(user_id, 20)
+    return time.perf_counter() - start
+
+
+async def run(backend, users, commands, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            return await spin(backend, random.randrange(users))
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(commands)))
+    return latencies, time.perf_counter() - start
+
+
+def report(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f'{name:>16}: mean {statistics.mean(latencies) * 1000:8.2f} ms  '
+          f'p95 {p95 * 1000:8.2f} ms  {len(latencies) / elapsed:8.1f} commands/s')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Per-command storage latency under concurrent load.')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--commands', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        storage = Storage(path)
+        await storage.open()
+        await storage.db.executemany('INSERT INTO balances (user_id, balance) VALUES (?, ?)',
+                                     ((user_id, 1000) for user_id in range(args.users)))
+        await storage.db.commit()
+
+        latencies, elapsed = await run(ConnectPerCall(path), args.users, args.commands, args.concurrency)
+        report('connect-per-call', latencies, elapsed)
+
+        latencies, elapsed = await run(SharedLedger(storage), args.users, args.commands, args.concurrency)
+        report('shared storage', latencies, elapsed)
+
+        cache = BalanceCache(storage, os.path.join(tmp, 'balances.journal'))
+        await cache.start()
+        latencies, elapsed = await run(SharedLedger(storage, cache), args.users, args.commands, args.concurrency)
+        await cache.close()
+        report('write-behind', latencies, elapsed)
+        await storage.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
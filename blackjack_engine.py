@@ -0,0 +1,81 @@
+import random
+from array import array
+
+DECK = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * 4
+DEALER_STANDS_ON = 17
+
+
+class Shoe:
+    # `decks` decks dealt without replacement from one byte array. A cut card
+    # is placed `penetration` of the way in; once it has been dealt the shoe
+    # is reshuffled before the next round.
+
+    def __init__(self, decks=6, penetration=0.75, rng=random):
+        self.decks = decks
+        self.cards = array('B', DECK * decks)
+        self.cut = int(len(self.cards) * penetration)
+        self.rng = rng
+        self.position = 0
+        self.shuffle()
+
+    def __len__(self):
+        return len(self.cards) - self.position
+
+    def shuffle(self, rng=None):
+        # Always shuffles from a fresh shoe, so the order depends only on
+        # the generator and a shuffle can be replayed from its seed.
+        if rng is not None:
+            self.rng = rng
+        self.cards = array('B', DECK * self.decks)
+        self.rng.shuffle(self.cards)
+        self.position = 0
+
+    def past_cut(self):
+        return self.position >= self.cut
+
+    def start_round(self):
+        if self.past_cut():
+            self.shuffle()
+
+    def draw(self):
+        # A round never runs past the cut card by more than the shoe holds
+        # unless many hands split at once; reshuffle rather than fail then.
+        if self.position == len(self.cards):
+            self.shuffle()
+        card = self.cards[self.position]
+        self.position += 1
+        return card
+
+
+def calculate_hand_value(hand):
+    if isinstance(hand[0], list):
+        return [calculate_hand_value(h) for h in hand]
+    value = sum(hand)
+    if value > 21 and 11 in hand:
+        hand[hand.index(11)] = 1
+        value = sum(hand)
+    return value
+
+
+def dealer_play(hand, draw):
+    # The dealer draws until reaching DEALER_STANDS_ON, standing on soft 17.
+    while calculate_hand_value(hand) < DEALER_STANDS_ON:
+        hand.append(draw())
+    return calculate_hand_value(hand)
+
+
+def is_pair(hand):
+    return len(hand) == 2 and hand[0] == hand[1]
+
+
+def resolve_hand(player_value, dealer_value, bet):
+    # Returns the result text and the winnings: negative for a lost bet,
+    # otherwise the amount credited back to the player.
+    if player_value > 21:
+        return "Dealer WINS!", -bet
+    elif dealer_value > 21 or player_value > dealer_value:
+        return 'You WIN!', int(bet * 2.5)
+    elif player_value == dealer_value:
+        return "It's a DRAW!", bet
+    else:
+        return "Dealer WINS!", -bet
@@ -0,0 +1,174 @@
+import asyncio
+import struct
+import time
+from collections import OrderedDict
+
+
+# Session blob: dealer up card, dealer hole card (0 while face down), hand
+# count, then per hand its bet, ended flag, card count and cards.
+HEADER = struct.Struct('<BBB')
+HAND = struct.Struct('<qBB')
+
+LOAD_SQL = 'SELECT state, touched, shoe FROM blackjack_sessions WHERE user_id = ?'
+SAVE_SQL = 'INSERT OR REPLACE INTO blackjack_sessions (user_id, state, touched, shoe) VALUES (?, ?, ?, ?)'
+DELETE_SQL = 'DELETE FROM blackjack_sessions WHERE user_id = ? RETURNING shoe'
+
+
+class Hand:
+    __slots__ = ('cards', 'bet', 'ended')
+
+    def __init__(self, cards, bet, ended=False):
+        self.cards = bytearray(cards)
+        self.bet = bet
+        self.ended = ended
+
+    def copy(self):
+        return Hand(self.cards, self.bet, self.ended)
+
+
+class Session:
+    # One player's blackjack game. Cards are card values stored in
+    # bytearrays, which keeps a typical session to a few hundred bytes.
+    # `shoe` is the label of the RNG round the game was dealt from.
+
+    __slots__ = ('user_id', 'hands', 'dealer', 'touched', 'shoe')
+
+    def __init__(self, user_id, hands, dealer, touched=None, shoe=None):
+        self.user_id = user_id
+        self.hands = hands
+        self.dealer = bytearray(dealer)
+        self.touched = time.time() if touched is None else touched
+        self.shoe = shoe
+
+    def stake(self):
+        return sum(hand.bet for hand in self.hands)
+
+    def pack(self):
+        parts = [HEADER.pack(self.dealer[0], self.dealer[1], len(self.hands))]
+        for hand in self.hands:
+            parts.append(HAND.pack(hand.bet, hand.ended, len(hand.cards)))
+            parts.append(bytes(hand.cards))
+        return b''.join(parts)
+
+    @classmethod
+    def unpack(cls, user_id, state, touched, shoe=None):
+        up, hole, count = HEADER.unpack_from(state)
+        offset = HEADER.size
+        hands = []
+        for _ in range(count):
+            bet, ended, length = HAND.unpack_from(state, offset)
+            offset += HAND.size
+            hands.append(Hand(state[offset:offset + length], bet, bool(ended)))
+            offset += length
+        return cls(user_id, hands, (up, hole), touched, shoe)
+
+
+class SessionStore:
+    # Blackjack sessions by user id, written through to the
+    # blackjack_sessions table on every change so games in progress survive
+    # a restart. Sessions idle for longer than ttl seconds are expired: with
+    # the 'refund' policy their stakes are credited back, with 'forfeit' the
+    # house keeps them. A shared store is used when several processes serve
+    # the same players: it reads every session from the table instead of
+    # keeping them in memory.
+
+    def __init__(self, storage, ledger, ttl=1800, policy='refund', sweep_interval=60, shared=False):
+        if policy not in ('refund', 'forfeit'):
+            raise ValueError(f'unknown expiry policy {policy!r}')
+        self.storage = storage
+        self.ledger = ledger
+        self.ttl = ttl
+        self.policy = policy
+        self.sweep_interval = sweep_interval
+        self.shared = shared
+        # Least recently touched first, so a sweep stops at the first live one.
+        self.sessions = OrderedDict()
+        self.sweeper = None
+        self.listeners = []
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def subscribe(self, listener):
+        # await listener(shoe) runs after every session that ends, settled
+        # or expired, with the label of the shoe it was dealt from.
+        self.listeners.append(listener)
+
+    async def open_on(self, shoe):
+        # True while any game dealt from that shoe is open, in any process.
+        return await self.storage.fetchone('SELECT 1 FROM blackjack_sessions WHERE shoe = ? LIMIT 1', (shoe,)) is not None
+
+    async def open_shoes(self):
+        return {shoe for shoe, in await self.storage.fetchall('SELECT DISTINCT shoe FROM blackjack_sessions WHERE shoe IS NOT NULL')}
+
+    async def get(self, user_id):
+        if not self.shared:
+            return self.sessions.get(user_id)
+        row = await self.storage.fetchone(LOAD_SQL, (user_id,))
+        return Session.unpack(user_id, *row) if row else None
+
+    async def start(self):
+        if not self.shared:
+            rows = await self.storage.fetchall('SELECT user_id, state, touched, shoe FROM blackjack_sessions ORDER BY touched')
+            for user_id, state, touched, shoe in rows:
+                self.sessions[user_id] = Session.unpack(user_id, state, touched, shoe)
+        self.sweeper = asyncio.create_task(self.sweep_loop())
+
+    async def close(self):
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+            try:
+                await self.sweeper
+            except asyncio.CancelledError:
+                pass
+            self.sweeper = None
+
+    async def save(self, session):
+        session.touched = time.time()
+        if not self.shared:
+            self.sessions[session.user_id] = session
+            self.sessions.move_to_end(session.user_id)
+        async with self.storage.lock:
+            await self.storage.db.execute(SAVE_SQL, (session.user_id, session.pack(), session.touched, session.shoe))
+            await self.storage.db.commit()
+
+    async def delete(self, user_id):
+        # True if this call removed the session. Only that caller may settle
+        # or refund it, which matters when several processes share the table.
+        self.sessions.pop(user_id, None)
+        async with self.storage.lock:
+            rows = await self.storage.db.execute_fetchall(DELETE_SQL, (user_id,))
+            await self.storage.db.commit()
+        if not rows:
+            return False
+        for listener in self.listeners:
+            await listener(rows[0][0])
+        return True
+
+    async def sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as error:
+                print(f'Blackjack session sweep failed: {error!r}')
+
+    async def sweep(self):
+        deadline = time.time() - self.ttl
+        expired = []
+        if self.shared:
+            rows = await self.storage.fetchall('SELECT user_id, state, touched, shoe FROM blackjack_sessions WHERE touched <= ?', (deadline,))
+            candidates = [Session.unpack(*row) for row in rows]
+        else:
+            candidates = []
+            for session in self.sessions.values():
+                if session.touched > deadline:
+                    break
+                candidates.append(session)
+        for session in candidates:
+            if not await self.delete(session.user_id):
+                continue
+            expired.append(session)
+            if self.policy == 'refund' and session.stake() > 0:
+                await self.ledger.credit(session.user_id, session.stake())
+        return expired
@@ -0,0 +1,167 @@
+import argparse
+from functools import lru_cache
+
+from blackjack_engine import DEALER_STANDS_ON, calculate_hand_value, is_pair
+
+# Expected values per token staked, dealing from an infinite shoe: every
+# card value has the same odds on every draw. With six decks the composition
+# effects this ignores are a few hundredths of a percent.
+
+CARD_ODDS = {card: (4 if card == 10 else 1) / 13 for card in range(2, 12)}
+UP_CARDS = list(range(2, 12))
+WIN_PAYOUT = 2.5
+BUST = 22
+
+ACTIONS = {'stand': 'S', 'hit': 'H', 'double': 'D', 'split': 'P'}
+
+
+def add(total, soft, card):
+    # (total, soft) after drawing card, counting one ace as 11 while that
+    # does not bust the hand.
+    if card == 11:
+        if total + 11 <= 21:
+            return total + 11, True
+        card = 1
+    total += card
+    if total > 21 and soft:
+        return total - 10, False
+    return total, soft
+
+
+def hand_state(cards):
+    # Aces already counted as 1 by calculate_hand_value stay 1.
+    total, soft = 0, False
+    for card in cards:
+        total, soft = add(total, soft, card)
+    return total, soft
+
+
+@lru_cache(maxsize=None)
+def dealer_outcomes(total, soft):
+    # Probability of each final dealer total, BUST for a bust.
+    if total > 21:
+        return {BUST: 1.0}
+    if total >= DEALER_STANDS_ON:
+        return {total: 1.0}
+    outcomes = {}
+    for card, odds in CARD_ODDS.items():
+        for final, probability in dealer_outcomes(*add(total, soft, card)).items():
+            outcomes[final] = outcomes.get(final, 0.0) + odds * probability
+    return outcomes
+
+
+def dealer_final(up):
+    # The hole card is dealt face down and there is no peek, so the dealer's
+    # final total only depends on the up card.
+    return dealer_outcomes(*add(0, False, up))
+
+
+class Solver:
+    # Hit, stand, double and split EVs for the bot's rules: a win pays
+    # `payout` times the stake back, a draw returns the stake, a player bust
+    # loses even if the dealer busts, the dealer stands on 17 and a hand may
+    # double at any point.
+
+    def __init__(self, payout=WIN_PAYOUT):
+        self.payout = payout
+        self.stand = lru_cache(maxsize=None)(self.stand)
+        self.best = lru_cache(maxsize=None)(self.best)
+
+    def stand(self, total, up):
+        if total > 21:
+            return -1.0
+        win = self.payout - 1
+        ev = 0.0
+        for final, probability in dealer_final(up).items():
+            if final == BUST or total > final:
+                ev += probability * win
+            elif total < final:
+                ev -= probability
+        return ev
+
+    def hit(self, total, soft, up):
+        ev = 0.0
+        for card, odds in CARD_ODDS.items():
+            next_total, next_soft = add(total, soft, card)
+            ev += odds * (-1.0 if next_total > 21 else self.best(next_total, next_soft, up))
+        return ev
+
+    def double(self, total, soft, up):
+        return 2 * sum(odds * self.stand(add(total, soft, card)[0], up) for card, odds in CARD_ODDS.items())
+
+    def best(self, total, soft, up):
+        return max(self.stand(total, up), self.hit(total, soft, up), self.double(total, soft, up))
+
+    def split(self, card, up):
+        # Each hand keeps one card of the pair and is dealt a new one. The
+        # second hand stakes the same bet, and hands are not split again.
+        start = add(0, False, card)
+        return 2 * sum(odds * self.best(*add(*start, other), up) for other, odds in CARD_ODDS.items())
+
+    def state_evs(self, total, soft, up):
+        return {
+            'stand': self.stand(total, up),
+            'hit': self.hit(total, soft, up),
+            'double': self.double(total, soft, up),
+        }
+
+    def evs(self, cards, up, can_split=False):
+        evs = self.state_evs(*hand_state(cards), up)
+        if can_split and is_pair(cards):
+            evs['split'] = self.split(cards[0], up)
+        return evs
+
+    def advice(self, cards, up, can_split=False):
+        evs = self.evs(cards, up, can_split)
+        return max(evs, key=evs.get), evs
+
+    def round_ev(self):
+        # Expected return of a fresh round under best play. calculate_hand_value
+        # turns one ace of a dealt pair of aces into a 1 before the pair is
+        # checked, so aces can never be split.
+        ev = 0.0
+        for first, first_odds in CARD_ODDS.items():
+            for second, second_odds in CARD_ODDS.items():
+                cards = [first, second]
+                calculate_hand_value(cards)
+                for up, up_odds in CARD_ODDS.items():
+                    ev += first_odds * second_odds * up_odds * max(self.evs(cards, up, can_split=True).values())
+        return ev
+
+    def chart(self):
+        # One row per hard total, soft total and pair; one column per dealer up card.
+        header = 'Up card:  ' + ' '.join(f'{"A" if up == 11 else up:>2}' for up in UP_CARDS)
+        lines = ['Hard totals', header]
+        for total in range(5, 21):
+            lines.append(f'{total:>8}  ' + ' '.join(self.letter(self.state_evs(total, False, up)) for up in UP_CARDS))
+        lines += ['Soft totals', header]
+        for other in range(2, 10):
+            lines.append(f'{"A," + str(other):>8}  ' + ' '.join(self.letter(self.state_evs(11 + other, True, up)) for up in UP_CARDS))
+        lines += ['Pairs', header]
+        for card in range(2, 11):
+            lines.append(f'{f"{card},{card}":>8}  ' + ' '.join(self.letter(self.evs([card, card], up, True)) for up in UP_CARDS))
+        return '\n'.join(lines)
+
+    def letter(self, evs):
+        return f'{ACTIONS[max(evs, key=evs.get)]:>2}'
+
+
+@lru_cache(maxsize=None)
+def solver(payout=WIN_PAYOUT):
+    return Solver(payout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Best-play EVs and house edge of the blackjack rules.')
+    parser.add_argument('--payout', type=float, default=WIN_PAYOUT, help='amount a win pays back per token staked')
+    parser.add_argument('--chart', action='store_true', help='print the best action for every hand')
+    args = parser.parse_args()
+    table = solver(args.payout)
+    ev = table.round_ev()
+    print(f'Win pays {args.payout}x: player EV {ev:+.4%} per token staked (house edge {-ev:.4%})')
+    if args.chart:
+        print(table.chart())
+
+
+if __name__ == '__main__':
+    main()
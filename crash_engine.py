@@ -0,0 +1,20 @@
+import random
+
+
+def crash_threshold(rng=random):
+    if rng.random() < 0.03:
+        return 1.0
+    return rng.uniform(1.0, 5.0)
+
+
+# The multiplier is a function of time since the round started, so what a
+# player is paid never depends on how often the message gets redrawn.
+GROWTH_PER_SECOND = 0.5
+
+
+def multiplier(elapsed):
+    return 1.0 + GROWTH_PER_SECOND * elapsed
+
+
+def crash_time(threshold):
+    return (threshold - 1.0) / GROWTH_PER_SECOND
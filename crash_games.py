@@ -0,0 +1,214 @@
+import asyncio
+import math
+import time
+
+import crash_engine
+from ledger import Transaction
+
+CRASH_COUNTDOWN = 15
+
+
+class AlreadyJoined(Exception):
+    pass
+
+
+class GameClosed(Exception):
+    pass
+
+
+class Player:
+    def __init__(self, user, wager):
+        self.user = user
+        self.wager = wager
+        self.pulled_out = False
+
+    def pull_out(self):
+        self.pulled_out = True
+
+
+class CrashGame:
+    def __init__(self, ctx, manager):
+        self.ctx = ctx
+        self.manager = manager
+        self.game_in_progress = False
+        self.players = {}
+        self.message = None
+        self.round = None
+        self.crash_threshold = None
+        self.crash_seconds = None
+        self.started = None
+
+    async def calculate_crash_threshold(self):
+        # The round stays hidden until the manager reveals it after the crash.
+        self.round = await self.manager.rng.round('crash', hidden=True)
+        self.crash_threshold = crash_engine.crash_threshold(self.round.rng)
+        self.crash_seconds = crash_engine.crash_time(self.crash_threshold)
+
+    @property
+    def footer(self):
+        return f"\nRound {self.round.label}, commitment {self.round.commitment[:16]}"
+
+    def multiplier_at(self, now):
+        # Cash-outs are priced from the moment the reaction arrived, not from
+        # whatever frame the message happens to show.
+        if self.started is None:
+            return 1.0
+        return crash_engine.multiplier(min(now - self.started, self.crash_seconds))
+
+    def crashed_at(self, now):
+        return self.started is not None and now - self.started >= self.crash_seconds
+
+    def render(self, elapsed):
+        if elapsed >= self.crash_seconds:
+            return f"Crash game: The multiplier crashed at {self.crash_threshold:.2f}x" + self.footer
+        return f"Crash game: The multiplier is {crash_engine.multiplier(elapsed):.2f}x" + self.footer
+
+    async def start_game(self):
+        self.game_in_progress = True
+        await self.calculate_crash_threshold()
+        crash_message = await self.ctx.send(f"Crash game starting in {CRASH_COUNTDOWN} seconds..." + self.footer)
+        self.message = crash_message
+        self.manager.router.register(crash_message.id, self.on_reaction)
+        await crash_message.add_reaction("🛑")
+        await self.start_countdown(crash_message)
+
+        self.started = time.monotonic()
+        await self.manager.animator.play(self.ctx.channel, None, self.render, self.crash_seconds, message=crash_message)
+        # The animation can end early if it fails; cash-outs stay open until the crash.
+        remaining = self.started + self.crash_seconds - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+        # Joins still waiting on their debit may leave the table meanwhile.
+        for player in list(self.players.values()):
+            if not player.pulled_out:
+                # Taken out of the game before anything awaits, so a late
+                # reaction cannot cash out a loss that is being recorded.
+                player.pull_out()
+                # The wager was taken on joining; only the round is left to record.
+                await self.manager.rollups.commit(Transaction(), player.user.id, 'crash', player.wager, 0)
+                self.manager.round_log.record(player.user.id, 'crash', player.wager, 0)
+                lost_amount = player.wager
+                await self.ctx.send(f"{player.user.mention}, the multiplier crashed! You have lost {lost_amount} tokens.")
+        self.game_in_progress = False
+
+    async def add_player(self, user, wager):
+        # Takes the wager and seats the player. The seat is claimed before the
+        # debit, out of play until it is paid for, so a second join fails
+        # instead of being charged too; the game is checked again once the
+        # debit lands, since it may have started meanwhile. Raises
+        # AlreadyJoined, GameClosed or InsufficientFunds.
+        if not self.game_in_progress or self.started is not None:
+            raise GameClosed()
+        if user.id in self.players:
+            raise AlreadyJoined()
+        player = self.players[user.id] = Player(user, wager)
+        player.pull_out()
+        try:
+            await self.manager.ledger.debit(user.id, wager)
+        except BaseException:
+            del self.players[user.id]
+            raise
+        if not self.game_in_progress or self.started is not None:
+            del self.players[user.id]
+            await self.manager.ledger.credit(user.id, wager)
+            raise GameClosed()
+        player.pulled_out = False
+
+    async def start_countdown(self, crash_message):
+        def countdown(elapsed):
+            if elapsed >= CRASH_COUNTDOWN:
+                return "Crash game: The multiplier is 1.00x" + self.footer
+            return f"Crash game starting in {math.ceil(CRASH_COUNTDOWN - elapsed)} seconds..." + self.footer
+        await self.manager.animator.play(self.ctx.channel, None, countdown, CRASH_COUNTDOWN, message=crash_message)
+
+    async def on_reaction(self, payload):
+        reacted_at = time.monotonic()
+        if str(payload.emoji) == "🛑":
+            await self.cash_out(payload.user_id, reacted_at)
+
+    async def cash_out(self, user_id, reacted_at):
+        if not self.game_in_progress or self.crashed_at(reacted_at):
+            return
+        player = self.players.get(user_id)
+        if player is None or player.pulled_out:
+            return
+        player.pull_out()
+        multiplier = self.multiplier_at(reacted_at)
+        payout = int(player.wager * multiplier)
+        balances = await self.manager.rollups.commit(Transaction().credit(user_id, payout), user_id, 'crash', player.wager, payout)
+        new_balance = balances[user_id]
+        self.manager.round_log.record(user_id, 'crash', player.wager, payout, round(multiplier * 100))
+        await self.ctx.send(f"{player.user.mention}, you have pulled out at {multiplier:.2f}x! You won {payout} tokens. Your new balance is {new_balance} tokens.")
+
+    async def refund(self):
+        # Wagers of a game that never reached its crash go back to the
+        # players who were still in.
+        if self.crashed_at(time.monotonic()):
+            return
+        for player in list(self.players.values()):
+            if not player.pulled_out:
+                player.pull_out()
+                await self.manager.ledger.credit(player.user.id, player.wager)
+
+
+class CrashGameManager:
+    # Runs one crash game per channel, each as its own task. Games are found
+    # by channel for !crash, and each game registers its message with the
+    # reaction router for cash-outs, so neither lookup depends on how many
+    # games are running.
+
+    def __init__(self, ledger, animator, router, rng, round_log, rollups, max_games=100):
+        self.ledger = ledger
+        self.animator = animator
+        self.router = router
+        self.rng = rng
+        self.round_log = round_log
+        self.rollups = rollups
+        self.max_games = max_games
+        self.games = {}
+        self.tasks = {}
+
+    def __len__(self):
+        return len(self.games)
+
+    def get(self, channel_id):
+        return self.games.get(channel_id)
+
+    def full(self):
+        return len(self.games) >= self.max_games
+
+    def start(self, ctx):
+        # Returns the new game, or None if the channel already has one or the
+        # cap is reached.
+        channel_id = ctx.channel.id
+        if channel_id in self.games or self.full():
+            return None
+        game = self.games[channel_id] = CrashGame(ctx, self)
+        game.game_in_progress = True
+        self.tasks[channel_id] = asyncio.create_task(self.run(game))
+        return game
+
+    async def run(self, game):
+        channel_id = game.ctx.channel.id
+        try:
+            await game.start_game()
+        except BaseException as error:
+            await game.refund()
+            if not isinstance(error, Exception):
+                raise
+            print(f'Crash game in channel {channel_id} failed: {error!r}')
+        finally:
+            game.game_in_progress = False
+            del self.games[channel_id]
+            del self.tasks[channel_id]
+            if game.message is not None:
+                self.router.unregister(game.message.id)
+            if game.round is not None:
+                self.rng.reveal(game.round)
+
+    async def close(self):
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
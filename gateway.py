@@ -0,0 +1,41 @@
+import discord
+
+# Messages kept by the library in low-memory mode. Nothing in the bot reads
+# the message cache: games keep the messages they edit and listen to raw
+# reaction events, so this only serves discord.py's own lookups.
+LOW_MEMORY_MESSAGES = 100
+
+
+def default_intents():
+    intents = discord.Intents.all()
+    intents.typing = False
+    intents.presences = False
+    return intents
+
+
+def minimal_intents():
+    # What the commands need: guild and channel metadata for ctx.guild and
+    # permission checks, message content for the ! prefix, and reactions
+    # for the crash game's cash-out button.
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = True
+    intents.dm_messages = True
+    intents.message_content = True
+    intents.guild_reactions = True
+    return intents
+
+
+def client_options(low_memory=False):
+    # Keyword arguments for the bot's constructor.
+    if not low_memory:
+        return {'intents': default_intents()}
+    # Without the members intent nobody is cached or chunked at startup.
+    # Member arguments still resolve: mentions come with the message, and
+    # the converter queries the gateway by id or name for the rest.
+    return {
+        'intents': minimal_intents(),
+        'member_cache_flags': discord.MemberCacheFlags.none(),
+        'chunk_guilds_at_startup': False,
+        'max_messages': LOW_MEMORY_MESSAGES,
+    }
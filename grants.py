@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from ledger import Transaction
+
+GRANT_SQL = 'INSERT INTO grants (key, amount, recipients, granted_by, granted_at) VALUES (?, ?, ?, ?, ?)'
+
+
+class Grants:
+    # Admin grants and airdrops: one amount credited to many players in a
+    # single bulk ledger transaction. Every grant has an idempotency key,
+    # recorded in the grants table by that same transaction, and a key that
+    # has been used is refused, so repeating a grant after a timeout or a
+    # restart pays out once. Grants run one at a time, and when sharded they
+    # all run in the ledger service (see RemoteGrants), so the check cannot
+    # race another process. The key is inserted rather than replaced, so a
+    # duplicate that got past it would fail the credits with it.
+
+    def __init__(self, storage, ledger):
+        self.storage = storage
+        self.ledger = ledger
+        self.lock = asyncio.Lock()
+
+    async def find(self, key):
+        # (amount, recipients, granted_by, granted_at) of a used key, or None.
+        await self.ledger.sync()
+        return await self.storage.fetchone('SELECT amount, recipients, granted_by, granted_at FROM grants WHERE key = ?', (key,))
+
+    async def grant(self, key, user_ids, amount, granted_by, progress=None):
+        # Returns {user_id: new_balance}, or None if `key` was used before.
+        if amount <= 0:
+            raise ValueError('grant amount must be positive')
+        user_ids = list(dict.fromkeys(user_ids))
+        async with self.lock:
+            if await self.find(key) is not None:
+                return None
+            txn = Transaction()
+            for user_id in user_ids:
+                txn.credit(user_id, amount)
+            txn.execute(GRANT_SQL, (key, amount, len(user_ids), granted_by, time.time()))
+            return await self.ledger.commit_bulk(txn, progress)
+
+
+class RemoteGrants(Grants):
+    # For shard processes. Grants are made by the ledger service, whose
+    # Grants sees every process's keys. Used keys are read here.
+
+    async def grant(self, key, user_ids, amount, granted_by, progress=None):
+        if amount <= 0:
+            raise ValueError('grant amount must be positive')
+        balances = await self.ledger.grant(key, list(dict.fromkeys(user_ids)), amount, granted_by)
+        if balances is not None and progress is not None:
+            # The service does the chunked work, so progress only hears the end.
+            progress(len(balances), len(balances))
+        return balances
+
+
+class Progress:
+    # A progress callback for Ledger.commit_bulk that reports through an
+    # async report(done, total), such as a message edit, at most every
+    # `interval` seconds and never while the previous report is running.
+
+    def __init__(self, report, interval=2.0):
+        self.report = report
+        self.interval = interval
+        self.last = 0.0
+        self.task = None
+
+    def __call__(self, done, total):
+        now = time.monotonic()
+        if now - self.last < self.interval or (self.task is not None and not self.task.done()):
+            return
+        self.last = now
+        self.task = asyncio.create_task(self.report(done, total))
+
+    async def wait(self):
+        # Lets the last report land before the final one is made.
+        if self.task is not None:
+            await asyncio.gather(self.task, return_exceptions=True)
@@ -0,0 +1,72 @@
+import asyncio
+from collections import OrderedDict
+
+from ledger import Transaction
+
+SHOP = {
+    "rock": 1000000,
+    "plastic_cup": 100000,
+    "paperclip": 10000,
+}
+
+SHOP_TEXT = "Shop items:\n" + "".join(f"{item}: {price} tokens\n" for item, price in SHOP.items())
+
+ITEM_SQL = 'INSERT OR REPLACE INTO inventories (user_id, item, qty) VALUES (?, ?, ?)'
+
+
+class Inventory:
+    # Item counts per user from the inventories table, read on first use
+    # and kept in a bounded LRU cache. A purchase debits the price and writes
+    # the new count in one ledger transaction.
+
+    def __init__(self, storage, ledger, capacity=50000):
+        self.storage = storage
+        self.ledger = ledger
+        self.capacity = capacity
+        self.items = OrderedDict()
+        # Purchases commit one at a time, so the counts they write land in
+        # the order they were computed.
+        self.lock = asyncio.Lock()
+
+    async def load(self, user_id):
+        items = self.items.get(user_id)
+        if items is not None:
+            self.items.move_to_end(user_id)
+            return items
+        # A purchase evicted from here may still be waiting in the balance cache.
+        await self.ledger.sync()
+        rows = await self.storage.fetchall('SELECT item, qty FROM inventories WHERE user_id = ? AND qty > 0 ORDER BY item', (user_id,))
+        items = self.items.get(user_id)
+        if items is None:
+            items = self.items[user_id] = dict(rows)
+            while len(self.items) > self.capacity:
+                self.items.popitem(last=False)
+        return items
+
+    async def buy(self, user_id, item, qty=1):
+        # Returns (new balance, new count). Raises InsufficientFunds.
+        if qty <= 0:
+            raise ValueError('quantity must be positive')
+        price = SHOP[item] * qty
+        async with self.lock:
+            items = await self.load(user_id)
+            count = items.get(item, 0) + qty
+            txn = Transaction().debit(user_id, price).execute(ITEM_SQL, (user_id, item, count))
+            balances = await self.ledger.commit(txn)
+            items[item] = count
+        return balances[user_id], count
+
+
+class RemoteInventory(Inventory):
+    # For shard processes. Purchases are made by the ledger service, whose
+    # Inventory sees every process's purchases, so counts written from two
+    # processes cannot overwrite each other. Only counts are read here,
+    # uncached.
+
+    def __init__(self, storage, ledger):
+        super().__init__(storage, ledger, capacity=0)
+
+    async def buy(self, user_id, item, qty=1):
+        if qty <= 0:
+            raise ValueError('quantity must be positive')
+        return await self.ledger.buy(user_id, item, qty)
@@ -0,0 +1,82 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_for(path, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if process.poll() is not None:
+            sys.exit(f'Ledger service exited with status {process.returncode}')
+        if time.monotonic() > deadline:
+            sys.exit(f'Ledger service did not create {path} within {timeout}s')
+        time.sleep(0.1)
+
+
+def stop(processes, timeout=15):
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        try:
+            process.wait(timeout=max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the bot as several shard processes sharing one ledger service.')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--shards', type=int, default=None, help='total gateway shards (default: one per process)')
+    parser.add_argument('--socket', default='ledger.sock')
+    parser.add_argument('--database', default='leaderboard.db')
+    parser.add_argument('--journal', default='balances.journal')
+    args = parser.parse_args()
+    shards = args.shards or args.processes
+    processes = min(args.processes, shards)
+
+    # A socket left over from a killed service would look like a live one.
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+    service = subprocess.Popen([sys.executable, os.path.join(HERE, 'ledger_service.py'),
+                                '--database', args.database, '--journal', args.journal, '--socket', args.socket],
+                               start_new_session=True)
+    children = [service]
+    # Ctrl+C reaches the whole process group, which would stop the service
+    # alongside the bots; children get their own sessions and are stopped in
+    # order below instead. SIGTERM from a supervisor takes the same path.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        wait_for(args.socket, service)
+        for index in range(processes):
+            shard_ids = range(index, shards, processes)
+            env = dict(os.environ,
+                       LEDGER_SOCKET=os.path.abspath(args.socket),
+                       SHARD_COUNT=str(shards),
+                       SHARD_IDS=','.join(map(str, shard_ids)),
+                       METRICS_PATH=f'metrics.{index}.prom')
+            children.append(subprocess.Popen([sys.executable, os.path.join(HERE, 'slot_bot.py')], env=env,
+                                             start_new_session=True))
+            print(f'Started bot process {index} for shards {list(shard_ids)}')
+        # Any process exiting takes the rest down with it; a supervisor
+        # (systemd, docker) restarts the whole group.
+        while all(child.poll() is None for child in children):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        # Bots first, and all of them before the service: each bot closes on
+        # SIGTERM and sends its last commits to the service before exiting.
+        stop(children[1:])
+        stop(children[:1])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import json
+
+
+class InsufficientFunds(Exception):
+    def __init__(self, user_id, amount):
+        super().__init__(f'user {user_id} cannot cover a debit of {amount} tokens')
+        self.user_id = user_id
+        self.amount = amount
+
+
+class Transaction:
+    # A batch of balance legs that is applied all-or-nothing by Ledger.commit.
+    # Debits are conditional: the whole transaction is rolled back if any
+    # account would go below zero. Statements added with execute() are
+    # committed together with the legs, exactly once. With the balance
+    # cache they run at the next flush, in commit order.
+
+    def __init__(self):
+        self.legs = []
+        self.statements = []
+
+    def debit(self, user_id, amount: int):
+        if amount < 0:
+            raise ValueError('debit amount must not be negative')
+        self.legs.append((user_id, -amount))
+        return self
+
+    def credit(self, user_id, amount: int):
+        if amount < 0:
+            raise ValueError('credit amount must not be negative')
+        self.legs.append((user_id, amount))
+        return self
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, tuple(params)))
+        return self
+
+
+DEBIT_SQL = 'UPDATE balances SET balance = balance - ? WHERE user_id = ? AND balance >= ? RETURNING balance'
+CREDIT_SQL = ('INSERT INTO balances (user_id, balance) VALUES (?, ?) '
+              'ON CONFLICT(user_id) DO UPDATE SET balance = balance + excluded.balance RETURNING balance')
+BULK_CREDIT_SQL = ('INSERT INTO balances (user_id, balance) VALUES (?, ?) '
+                   'ON CONFLICT(user_id) DO UPDATE SET balance = balance + excluded.balance')
+# Balances of a JSON list of user ids, so thousands are read in one query.
+BALANCES_SQL = 'SELECT user_id, balance FROM balances WHERE user_id IN (SELECT value FROM json_each(?))'
+BULK_CHUNK = 10000
+
+
+def credit_totals(txn):
+    # {user_id: total credit} of a transaction made only of credits.
+    totals = {}
+    for user_id, delta in txn.legs:
+        if delta < 0:
+            raise ValueError('bulk transactions may only credit')
+        totals[user_id] = totals.get(user_id, 0) + delta
+    return totals
+
+
+class Ledger:
+    # Every balance mutation goes through here. Each leg is a single statement
+    # that returns the new balance, so callers never need to read it back.
+    # With a write-behind cache the legs are applied in memory instead and
+    # the cache takes care of writing them back to SQLite.
+
+    def __init__(self, storage, cache=None):
+        self.storage = storage
+        self.cache = cache
+        self.listeners = []
+
+    def subscribe(self, listener):
+        # listener(balances) is called with {user_id: new_balance} after every commit.
+        self.listeners.append(listener)
+
+    def notify(self, balances):
+        for listener in self.listeners:
+            listener(balances)
+        return balances
+
+    async def sync(self):
+        # Make SQLite reflect every committed change before querying it directly.
+        if self.cache is not None:
+            await self.cache.flush()
+
+    async def balance(self, user_id):
+        if self.cache is not None:
+            return await self.cache.get(user_id)
+        return await self.storage.get_balance(user_id) or 0
+
+    async def commit(self, txn):
+        if self.cache is not None:
+            return self.notify(await self.cache.apply(txn.legs, txn.statements))
+        db = self.storage.db
+        balances = {}
+        async with self.storage.lock:
+            try:
+                for user_id, delta in txn.legs:
+                    if delta < 0:
+                        rows = await db.execute_fetchall(DEBIT_SQL, (-delta, user_id, -delta))
+                        if not rows:
+                            raise InsufficientFunds(user_id, -delta)
+                    else:
+                        rows = await db.execute_fetchall(CREDIT_SQL, (user_id, delta))
+                    balances[user_id] = rows[0][0]
+                for sql, params in txn.statements:
+                    await db.execute(sql, params)
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+        return self.notify(balances)
+
+    async def commit_bulk(self, txn, progress=None):
+        # Ledger.commit for a transaction of many credits, such as an
+        # airdrop to thousands of players: the legs are written with
+        # executemany in chunks of BULK_CHUNK, all in one SQLite transaction
+        # (or loaded into the balance cache a chunk per query), instead of
+        # one statement per leg. progress(done, total) is called after each
+        # chunk; it must not block.
+        totals = credit_totals(txn)
+        user_ids = list(totals)
+        if self.cache is not None:
+            try:
+                await self.cache.load_many(user_ids, progress)
+                return self.notify(await self.cache.apply(list(totals.items()), txn.statements))
+            finally:
+                self.cache.unpin(user_ids)
+        db = self.storage.db
+        balances = {}
+        async with self.storage.lock:
+            try:
+                legs = list(totals.items())
+                for start in range(0, len(legs), BULK_CHUNK):
+                    await db.executemany(BULK_CREDIT_SQL, legs[start:start + BULK_CHUNK])
+                    if progress is not None:
+                        progress(min(start + BULK_CHUNK, len(legs)), len(legs))
+                for sql, params in txn.statements:
+                    await db.execute(sql, params)
+                for start in range(0, len(user_ids), BULK_CHUNK):
+                    rows = await db.execute_fetchall(BALANCES_SQL, (json.dumps(user_ids[start:start + BULK_CHUNK]),))
+                    balances.update(rows)
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+        return self.notify(balances)
+
+    async def credit(self, user_id, amount: int):
+        balances = await self.commit(Transaction().credit(user_id, amount))
+        return balances[user_id]
+
+    async def debit(self, user_id, amount: int):
+        balances = await self.commit(Transaction().debit(user_id, amount))
+        return balances[user_id]
+
+    async def settle(self, user_id, stake: int, payout: int):
+        # One game round: take the stake and pay out the winnings atomically.
+        balances = await self.commit(Transaction().debit(user_id, stake).credit(user_id, payout))
+        return balances[user_id]
+
+    async def transfer(self, sender_id, recipient_id, amount: int):
+        balances = await self.commit(Transaction().debit(sender_id, amount).credit(recipient_id, amount))
+        return balances[sender_id], balances[recipient_id]
@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import struct
+
+from ledger import InsufficientFunds, Ledger, Transaction
+
+# Every frame is a header of payload length, request id and op (requests) or
+# status (responses), followed by the payload. Clients may send any number
+# of requests without waiting; each connection's requests are applied in
+# the order they were sent and answered with the same request id. Ledger
+# updates are pushed to subscribed connections with request id 0.
+HEADER = struct.Struct('<IIB')
+LEG = struct.Struct('<qq')
+COUNT = struct.Struct('<I')
+USER = struct.Struct('<q')
+
+BALANCE, COMMIT, SYNC, SUBSCRIBE, BULK, CLAIM, BUY, GRANT = 1, 2, 3, 4, 5, 6, 7, 8
+OK, INSUFFICIENT, ERROR, PUSH = 0, 1, 2, 3
+
+
+def pack_balances(balances):
+    return COUNT.pack(len(balances)) + b''.join(LEG.pack(user_id, balance) for user_id, balance in balances.items())
+
+
+def unpack_legs(payload):
+    # Returns the (user_id, value) pairs and whatever follows them.
+    count, = COUNT.unpack_from(payload)
+    end = COUNT.size + count * LEG.size
+    return list(LEG.iter_unpack(payload[COUNT.size:end])), payload[end:]
+
+
+def frame(request_id, code, payload=b''):
+    return HEADER.pack(len(payload), request_id, code) + payload
+
+
+class LedgerServer:
+    # Serves one Ledger to every bot process over a Unix socket. The ledger
+    # normally sits on the write-behind cache, so only this process writes
+    # balances. Requests that arrive together are applied back to back and
+    # answered with a single write. Reward claims, purchases and grants are
+    # made here too, by the one ClaimStore, Inventory and Grants that see
+    # all of them.
+
+    def __init__(self, ledger, path, claims=None, inventory=None, grants=None):
+        self.ledger = ledger
+        self.path = path
+        self.claims = claims
+        self.inventory = inventory
+        self.grants = grants
+        self.server = None
+        self.subscribers = set()
+        self.connections = set()
+        ledger.subscribe(self.broadcast)
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.server = await asyncio.start_unix_server(self.serve, self.path)
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        for task in list(self.connections):
+            task.cancel()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+            self.server = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def connect_local(self):
+        # An in-process connection over a socket pair, for running the
+        # service and its clients in one event loop.
+        server_end, client_end = socket.socketpair()
+        reader, writer = await asyncio.open_connection(sock=server_end)
+        self.connections.add(asyncio.create_task(self.serve(reader, writer)))
+        return await asyncio.open_connection(sock=client_end)
+
+    def broadcast(self, balances):
+        if not self.subscribers:
+            return
+        push = frame(0, PUSH, pack_balances(balances))
+        for writer in list(self.subscribers):
+            if writer.is_closing():
+                self.subscribers.discard(writer)
+            else:
+                writer.write(push)
+
+    async def serve(self, reader, writer):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        buffer = bytearray()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                buffer += data
+                out = bytearray()
+                offset = 0
+                while len(buffer) - offset >= HEADER.size:
+                    length, request_id, op = HEADER.unpack_from(buffer, offset)
+                    end = offset + HEADER.size + length
+                    if len(buffer) < end:
+                        break
+                    payload = bytes(buffer[offset + HEADER.size:end])
+                    offset = end
+                    out += await self.handle(writer, request_id, op, payload)
+                del buffer[:offset]
+                if out:
+                    writer.write(out)
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            self.connections.discard(task)
+            writer.close()
+
+    async def handle(self, writer, request_id, op, payload):
+        try:
+            if op == BALANCE:
+                user_id, = USER.unpack(payload)
+                return frame(request_id, OK, USER.pack(await self.ledger.balance(user_id)))
+            if op in (COMMIT, BULK):
+                txn = Transaction()
+                txn.legs, extra = unpack_legs(payload)
+                if extra:
+                    txn.statements = [(sql, tuple(params)) for sql, params in json.loads(extra)]
+                commit = self.ledger.commit if op == COMMIT else self.ledger.commit_bulk
+                return frame(request_id, OK, pack_balances(await commit(txn)))
+            if op == SYNC:
+                await self.ledger.sync()
+                return frame(request_id, OK)
+            if op == SUBSCRIBE:
+                self.subscribers.add(writer)
+                return frame(request_id, OK)
+            if op == CLAIM and self.claims is not None:
+                user_id, kinds = json.loads(payload)
+                return frame(request_id, OK, json.dumps(await self.claims.claim(user_id, kinds)).encode())
+            if op == BUY and self.inventory is not None:
+                user_id, item, qty = json.loads(payload)
+                return frame(request_id, OK, json.dumps(await self.inventory.buy(user_id, item, qty)).encode())
+            if op == GRANT and self.grants is not None:
+                key, user_ids, amount, granted_by = json.loads(payload)
+                balances = await self.grants.grant(key, user_ids, amount, granted_by)
+                # An empty payload means the key was used before.
+                return frame(request_id, OK, b'' if balances is None else pack_balances(balances))
+            return frame(request_id, ERROR, f'unknown op {op}'.encode())
+        except InsufficientFunds as error:
+            return frame(request_id, INSUFFICIENT, LEG.pack(error.user_id, error.amount))
+        except Exception as error:
+            return frame(request_id, ERROR, repr(error).encode())
+
+
+class RemoteLedger(Ledger):
+    # A Ledger whose transactions are committed by a LedgerServer. Requests
+    # made in the same event loop iteration are sent in one write, and
+    # listeners are fed by the server's pushes, so they also see commits
+    # made by other processes.
+
+    def __init__(self, path=None):
+        super().__init__(storage=None)
+        self.path = path
+        self.reader = None
+        self.writer = None
+        self.receiver = None
+        self.pending = {}
+        self.outgoing = bytearray()
+        self.next_id = 1
+
+    async def connect(self, server=None):
+        # server: a LedgerServer in this process to connect to without a socket file.
+        if server is not None:
+            self.reader, self.writer = await server.connect_local()
+        else:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+        self.receiver = asyncio.create_task(self.receive())
+        if self.listeners:
+            await self.request(SUBSCRIBE)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.receiver is not None:
+            self.receiver.cancel()
+            await asyncio.gather(self.receiver, return_exceptions=True)
+            self.receiver = None
+
+    def request(self, op, payload=b''):
+        request_id = self.next_id
+        self.next_id = self.next_id % 0xFFFFFFFF + 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        if not self.outgoing:
+            asyncio.get_running_loop().call_soon(self.send)
+        self.outgoing += frame(request_id, op, payload)
+        return future
+
+    def send(self):
+        if self.writer.is_closing():
+            self.fail(ConnectionError('ledger service connection closed'))
+            return
+        self.writer.write(self.outgoing)
+        self.outgoing = bytearray()
+
+    def fail(self, error):
+        self.outgoing = bytearray()
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+    async def receive(self):
+        try:
+            while True:
+                length, request_id, status = HEADER.unpack(await self.reader.readexactly(HEADER.size))
+                payload = await self.reader.readexactly(length)
+                if status == PUSH:
+                    self.notify(dict(unpack_legs(payload)[0]))
+                    continue
+                future = self.pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if status == OK:
+                    future.set_result(payload)
+                elif status == INSUFFICIENT:
+                    future.set_exception(InsufficientFunds(*LEG.unpack(payload)))
+                else:
+                    future.set_exception(RuntimeError(f'ledger service: {payload.decode()}'))
+        except (ConnectionError, asyncio.IncompleteReadError) as error:
+            self.fail(ConnectionError(f'ledger service connection lost: {error!r}'))
+
+    async def sync(self):
+        await self.request(SYNC)
+
+    async def balance(self, user_id):
+        balance, = USER.unpack(await self.request(BALANCE, USER.pack(user_id)))
+        return balance
+
+    def encode(self, txn):
+        payload = COUNT.pack(len(txn.legs)) + b''.join(LEG.pack(user_id, delta) for user_id, delta in txn.legs)
+        if txn.statements:
+            payload += json.dumps(txn.statements).encode()
+        return payload
+
+    async def commit(self, txn):
+        return dict(unpack_legs(await self.request(COMMIT, self.encode(txn)))[0])
+
+    async def commit_bulk(self, txn, progress=None):
+        # The service does the chunked work, so progress only hears the end.
+        balances = dict(unpack_legs(await self.request(BULK, self.encode(txn)))[0])
+        if progress is not None:
+            progress(len(balances), len(balances))
+        return balances
+
+    async def claim(self, user_id, kinds):
+        # ClaimStore.claim, run by the service.
+        claimed, balance, waiting = json.loads(await self.request(CLAIM, json.dumps([user_id, list(kinds)]).encode()))
+        return claimed, balance, waiting
+
+    async def buy(self, user_id, item, qty):
+        # Inventory.buy, run by the service.
+        balance, count = json.loads(await self.request(BUY, json.dumps([user_id, item, qty]).encode()))
+        return balance, count
+
+    async def grant(self, key, user_ids, amount, granted_by):
+        # Grants.grant, run by the service.
+        payload = await self.request(GRANT, json.dumps([key, user_ids, amount, granted_by]).encode())
+        return dict(unpack_legs(payload)[0]) if payload else None
+
+
+async def serve(database, journal, path):
+    # Imported here so clients do not pull in the storage layer.
+    from storage import Storage
+    from balance_cache import BalanceCache
+    from rewards import ClaimStore
+    from inventory import Inventory
+    from grants import Grants
+
+    storage = Storage(database)
+    await storage.open()
+    cache = BalanceCache(storage, journal)
+    await cache.start()
+    ledger = Ledger(storage, cache)
+    server = LedgerServer(ledger, path, claims=ClaimStore(storage, ledger), inventory=Inventory(storage, ledger),
+                          grants=Grants(storage, ledger))
+    await server.start()
+    print(f'Ledger service listening on {path}')
+    # launch.py stops the service with SIGTERM; flush the cache on the way out.
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+        await cache.close()
+        await storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the balance ledger to bot processes over a Unix socket.')
+    parser.add_argument('--database', default='leaderboard.db')
+    parser.add_argument('--journal', default='balances.journal')
+    parser.add_argument('--socket', default='ledger.sock')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.database, args.journal, args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
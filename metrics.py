@@ -0,0 +1,153 @@
+import asyncio
+import functools
+import os
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds of the latency histogram buckets, Prometheus style.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count', 'errors')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation.
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    # Latency histograms, call counts and error counts, grouped by family
+    # (command, storage, rest) and one label per family. Recording is a dict
+    # lookup and a bisect over 15 bounds, cheap next to anything timed here.
+
+    def __init__(self):
+        self.families = {}
+        self.gauges = {}
+
+    def histogram(self, family, label):
+        histograms = self.families.get(family)
+        if histograms is None:
+            histograms = self.families[family] = {}
+        histogram = histograms.get(label)
+        if histogram is None:
+            histogram = histograms[label] = Histogram()
+        return histogram
+
+    def observe(self, family, label, seconds, failed=False):
+        histogram = self.histogram(family, label)
+        histogram.observe(seconds)
+        if failed:
+            histogram.errors += 1
+
+    def gauge(self, name, read):
+        # read() returns {metric: value}, sampled whenever metrics are exported.
+        self.gauges[name] = read
+
+    def timed(self, family, label, call):
+        @functools.wraps(call)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = await call(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self.observe(family, label, time.perf_counter() - start, failed)
+        return wrapper
+
+    def instrument(self, obj, family, names, prefix=''):
+        # Replaces the named coroutine methods of obj with timed ones.
+        for name in names:
+            setattr(obj, name, self.timed(family, prefix + name, getattr(obj, name)))
+
+    def instrument_http(self, http):
+        # Every Discord REST call goes through HTTPClient.request; label them
+        # by method and route template so the label set stays small.
+        request = http.request
+
+        async def timed_request(route, *args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = await request(route, *args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self.observe('rest', f'{route.method} {route.path}', time.perf_counter() - start, failed)
+
+        http.request = timed_request
+
+    def report(self, top=10):
+        lines = []
+        for family, histograms in sorted(self.families.items()):
+            lines.append(f'{family + ":":<42} {"calls":>8} {"errors":>6} {"mean":>8} {"p50":>8} {"p95":>8}')
+            ranked = sorted(histograms.items(), key=lambda item: item[1].sum, reverse=True)
+            for label, histogram in ranked[:top]:
+                lines.append(f'  {label[:40]:<40} {histogram.count:>8} {histogram.errors:>6} '
+                             f'{histogram.sum / histogram.count * 1000:>6.1f}ms '
+                             f'{histogram.quantile(0.5) * 1000:>6.1f}ms {histogram.quantile(0.95) * 1000:>6.1f}ms')
+        for name, read in self.gauges.items():
+            values = ', '.join(f'{metric}={value:.3g}' if isinstance(value, float) else f'{metric}={value}'
+                               for metric, value in read().items())
+            lines.append(f'{name}: {values}')
+        return '\n'.join(lines)
+
+    def prometheus(self):
+        lines = []
+        for family, histograms in sorted(self.families.items()):
+            metric = f'bot_{family}_seconds'
+            lines.append(f'# TYPE {metric} histogram')
+            for label, histogram in sorted(histograms.items()):
+                name = label.replace('\\', '\\\\').replace('"', '\\"')
+                seen = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                    seen += count
+                    lines.append(f'{metric}_bucket{{{family}="{name}",le="{bound}"}} {seen}')
+                lines.append(f'{metric}_sum{{{family}="{name}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{{family}="{name}"}} {histogram.count}')
+            lines.append(f'# TYPE bot_{family}_errors_total counter')
+            for label, histogram in sorted(histograms.items()):
+                name = label.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'bot_{family}_errors_total{{{family}="{name}"}} {histogram.errors}')
+        for name, read in self.gauges.items():
+            for metric, value in read().items():
+                lines.append(f'# TYPE bot_{name}_{metric} gauge')
+                lines.append(f'bot_{name}_{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, text):
+        # Written to a temporary file and renamed, so a scraper never reads
+        # half a file.
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as output:
+            output.write(text)
+        os.replace(temporary, path)
+
+    async def export_loop(self, path, interval=15):
+        while True:
+            try:
+                await asyncio.to_thread(self.write, path, self.prometheus())
+            except Exception as error:
+                print(f'Writing metrics to {path} failed: {error!r}')
+            await asyncio.sleep(interval)
@@ -0,0 +1,114 @@
+# Schema migrations, applied in order by migrate(). PRAGMA user_version holds
+# the number of migrations a database has had, so each one runs exactly once
+# per database. Append new migrations; never edit one that has shipped.
+
+MIGRATIONS = [
+    # 1: the tables Storage.create_tables used to create on every start.
+    [
+        'CREATE TABLE IF NOT EXISTS balances (user_id INTEGER PRIMARY KEY, balance INTEGER)',
+        'CREATE TABLE IF NOT EXISTS reward_claims (user_id INTEGER, kind TEXT, claimed_at REAL, PRIMARY KEY (user_id, kind))',
+        'CREATE TABLE IF NOT EXISTS inventories (user_id INTEGER, item TEXT, qty INTEGER, PRIMARY KEY (user_id, item))',
+        'CREATE TABLE IF NOT EXISTS blackjack_sessions (user_id INTEGER PRIMARY KEY, state BLOB, touched REAL)',
+    ],
+    # 2: scores was created but never written by any command.
+    [
+        'DROP TABLE IF EXISTS scores',
+    ],
+    # 3: the leaderboard only loads positive balances, and blackjack sessions
+    # are loaded oldest first. Replaces the full balance index create_tables
+    # used to make.
+    [
+        'DROP INDEX IF EXISTS balances_by_balance',
+        'CREATE INDEX balances_by_balance ON balances (balance DESC) WHERE balance > 0',
+        'CREATE INDEX blackjack_sessions_by_touched ON blackjack_sessions (touched)',
+    ],
+    # 4: hash chain epochs of the RNG service, kept so revealed rounds can
+    # be replayed. `revealed` counts the rounds that may be shown.
+    [
+        'CREATE TABLE rng_epochs (epoch INTEGER PRIMARY KEY, game TEXT, terminal BLOB, anchor BLOB, length INTEGER, revealed INTEGER, created REAL)',
+    ],
+    # 5: statistics rollups. `source` is the bot process that owns the row;
+    # totals are the sum over sources.
+    [
+        'CREATE TABLE user_stats (user_id INTEGER, game TEXT, source INTEGER, rounds INTEGER, wagered INTEGER, paid INTEGER, '
+        'biggest_win INTEGER, PRIMARY KEY (user_id, game, source))',
+        'CREATE TABLE house_stats (game TEXT, source INTEGER, rounds INTEGER, wagered INTEGER, paid INTEGER, PRIMARY KEY (game, source))',
+    ],
+    # 6: admin grants and airdrops by idempotency key, so a key pays out once.
+    [
+        'CREATE TABLE grants (key TEXT PRIMARY KEY, amount INTEGER, recipients INTEGER, granted_by INTEGER, granted_at REAL)',
+    ],
+    # 7: the last balance journal segment each cache has flushed, so a
+    # crash between a flush and deleting its segments replays nothing twice.
+    [
+        'CREATE TABLE journal_state (journal TEXT PRIMARY KEY, segment INTEGER)',
+    ],
+    # 8: open blackjack games remember the shoe round they were dealt from,
+    # and epochs record how far they were dealt and whether their process
+    # has closed them, so a shoe can be revealed after a restart once its
+    # last game ends.
+    [
+        'ALTER TABLE blackjack_sessions ADD COLUMN shoe TEXT',
+        'CREATE INDEX blackjack_sessions_by_shoe ON blackjack_sessions (shoe)',
+        'ALTER TABLE rng_epochs ADD COLUMN drawn INTEGER',
+        'ALTER TABLE rng_epochs ADD COLUMN closed INTEGER NOT NULL DEFAULT 0',
+    ],
+    # 9: rollup rows are added to in place, so processes can share one row
+    # per player and game; the rows each `source` process owned are merged.
+    [
+        'CREATE TABLE user_stats_merged (user_id INTEGER, game TEXT, rounds INTEGER, wagered INTEGER, paid INTEGER, '
+        'biggest_win INTEGER, PRIMARY KEY (user_id, game))',
+        'INSERT INTO user_stats_merged SELECT user_id, game, SUM(rounds), SUM(wagered), SUM(paid), MAX(biggest_win) '
+        'FROM user_stats GROUP BY user_id, game',
+        'DROP TABLE user_stats',
+        'ALTER TABLE user_stats_merged RENAME TO user_stats',
+        'CREATE TABLE house_stats_merged (game TEXT PRIMARY KEY, rounds INTEGER, wagered INTEGER, paid INTEGER)',
+        'INSERT INTO house_stats_merged SELECT game, SUM(rounds), SUM(wagered), SUM(paid) FROM house_stats GROUP BY game',
+        'DROP TABLE house_stats',
+        'ALTER TABLE house_stats_merged RENAME TO house_stats',
+    ],
+]
+
+# Per-connection settings. WAL lets reads proceed while a flush writes, and
+# with WAL, synchronous=NORMAL can lose the last commits on power loss but
+# never corrupts the database.
+PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA temp_store = MEMORY',
+    # Shard processes share the file with the ledger service.
+    'PRAGMA busy_timeout = 5000',
+]
+
+
+async def configure(db):
+    for pragma in PRAGMAS:
+        await db.execute(pragma)
+
+
+async def schema_version(db):
+    async with db.execute('PRAGMA user_version') as cursor:
+        return (await cursor.fetchone())[0]
+
+
+async def migrate(db, migrations=MIGRATIONS):
+    # Returns the migration numbers that were applied.
+    applied = []
+    version = await schema_version(db)
+    while version < len(migrations):
+        await db.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the lock.
+            version = await schema_version(db)
+            if version < len(migrations):
+                for sql in migrations[version]:
+                    await db.execute(sql)
+                version += 1
+                await db.execute(f'PRAGMA user_version = {version}')
+                applied.append(version)
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+    return applied
@@ -0,0 +1,138 @@
+import asyncio
+import functools
+from collections import deque
+
+MESSAGE_LIMIT = 2000
+
+
+def split_long(content, limit=MESSAGE_LIMIT):
+    # Pieces of at most limit characters, cut at line breaks where possible.
+    pieces = []
+    while len(content) > limit:
+        cut = content.rfind('\n', 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        pieces.append(content[:cut])
+        content = content[cut:].lstrip('\n')
+    pieces.append(content)
+    return pieces
+
+
+class Queue:
+    def __init__(self, channel):
+        self.channel = channel
+        self.pending = deque()  # (content, future)
+        self.task = None
+
+
+class Outbox:
+    # Coalesces the plain text messages a channel receives within `window`
+    # seconds into as few messages as the 2000 character limit allows, in the
+    # order they were posted. Sends draw on the same per-channel and global
+    # token buckets as the animation scheduler; while a channel waits for
+    # its budget, later messages simply join the next batch.
+
+    def __init__(self, animator, window=0.3, limit=MESSAGE_LIMIT):
+        self.animator = animator
+        self.window = window
+        self.limit = limit
+        self.queues = {}
+        self.batches = 0
+        self.posted = 0
+
+    def post(self, channel, content):
+        # Queues content and returns a future for the message that carries
+        # it, or its last part if it had to be split.
+        future = asyncio.get_running_loop().create_future()
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            queue = self.queues[channel.id] = Queue(channel)
+        pieces = split_long(str(content), self.limit)
+        # The future waits for the last piece, by which time all have been sent.
+        for piece in pieces[:-1]:
+            queue.pending.append((piece, None))
+        queue.pending.append((pieces[-1], future))
+        self.posted += 1
+        if queue.task is None:
+            queue.task = asyncio.create_task(self.run(queue))
+        return future
+
+    async def send(self, channel, content):
+        return await self.post(channel, content)
+
+    def take(self, queue):
+        # The longest run of queued pieces that fits in one message.
+        parts, futures = [], []
+        size = 0
+        while queue.pending:
+            content, future = queue.pending[0]
+            extra = len(content) + (1 if parts else 0)
+            if parts and size + extra > self.limit:
+                break
+            queue.pending.popleft()
+            parts.append(content)
+            size += extra
+            if future is not None:
+                futures.append(future)
+        return '\n'.join(parts), futures
+
+    async def run(self, queue):
+        bucket = self.animator.channel_bucket(queue.channel.id)
+        try:
+            await asyncio.sleep(self.window)
+            while queue.pending:
+                delay = max(bucket.delay(), self.animator.bucket.delay())
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                content, futures = self.take(queue)
+                bucket.take()
+                self.animator.bucket.take()
+                try:
+                    message = await queue.channel.send(content)
+                except Exception as error:
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(error)
+                    continue
+                self.batches += 1
+                for future in futures:
+                    if not future.done():
+                        future.set_result(message)
+        finally:
+            # Nothing may be left waiting on a queue whose task has ended.
+            for _, future in queue.pending:
+                if future is not None and not future.done():
+                    future.cancel()
+            del self.queues[queue.channel.id]
+
+    def coalesce(self, command):
+        # Decorator for command callbacks: ctx.send(text) within the command
+        # posts to the outbox instead of sending right away, and the command
+        # finishes once everything it posted has been delivered. Sends with
+        # embeds, files or other options go out directly, after anything
+        # already queued for the channel.
+        @functools.wraps(command)
+        async def wrapper(ctx, *args, **kwargs):
+            if getattr(ctx, 'outbox_posts', None) is not None:
+                return await command(ctx, *args, **kwargs)
+            posts = ctx.outbox_posts = []
+            direct = ctx.send
+
+            async def send(content=None, **options):
+                if options or content is None:
+                    await asyncio.gather(*posts)
+                    return await direct(content, **options)
+                future = self.post(ctx.channel, content)
+                posts.append(future)
+                return future
+
+            ctx.send = send
+            try:
+                result = await command(ctx, *args, **kwargs)
+            finally:
+                del ctx.send
+                ctx.outbox_posts = None
+            await asyncio.gather(*posts)
+            return result
+        return wrapper
@@ -0,0 +1,244 @@
+import asyncio
+import time
+from bisect import bisect_left, insort
+
+
+class NameCache:
+    # Display names for leaderboard rows. Names come from the gateway cache
+    # when the user is in it and from one concurrent batch of REST lookups
+    # otherwise; REST results expire after ttl seconds. User update events
+    # refresh names that are already cached.
+
+    def __init__(self, bot, ttl=3600):
+        self.bot = bot
+        self.ttl = ttl
+        self.names = {}
+
+    def store(self, user):
+        self.names[user.id] = (user.name, time.monotonic() + self.ttl)
+
+    def update(self, user):
+        if user.id in self.names:
+            self.store(user)
+            return True
+        return False
+
+    async def resolve(self, user_ids):
+        now = time.monotonic()
+        names = {}
+        missing = []
+        for user_id in user_ids:
+            cached = self.names.get(user_id)
+            if cached is not None and cached[1] > now:
+                names[user_id] = cached[0]
+                continue
+            user = self.bot.get_user(user_id)
+            if user is None:
+                missing.append(user_id)
+                continue
+            self.store(user)
+            names[user_id] = user.name
+
+        users = await asyncio.gather(*(self.bot.fetch_user(user_id) for user_id in missing), return_exceptions=True)
+        for user_id, user in zip(missing, users):
+            if isinstance(user, Exception):
+                names[user_id] = str(user_id)
+                continue
+            self.store(user)
+            names[user_id] = user.name
+        return names
+
+
+class RankIndex:
+    # Order-statistics index over positive balances, kept as a list of sorted
+    # sublists of (-balance, user_id) keys. A Fenwick tree over the sublist
+    # lengths turns "how many keys come before this sublist" and "which
+    # sublist holds position i" into O(log n) walks, so rank lookups, page
+    # slices and inserts stay cheap with hundreds of thousands of players.
+
+    load = 1000
+
+    def __init__(self):
+        self.balances = {}
+        self.lists = []
+        self.maxes = []
+        self.tree = [0]
+
+    def __len__(self):
+        return len(self.balances)
+
+    def bulk_load(self, rows):
+        self.balances = {user_id: balance for user_id, balance in rows if balance > 0}
+        keys = sorted((-balance, user_id) for user_id, balance in self.balances.items())
+        self.lists = [keys[i:i + self.load] for i in range(0, len(keys), self.load)]
+        self.maxes = [sublist[-1] for sublist in self.lists]
+        self.rebuild()
+
+    def rebuild(self):
+        tree = [0] + [len(sublist) for sublist in self.lists]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def grow(self, pos, delta):
+        pos += 1
+        while pos < len(self.tree):
+            self.tree[pos] += delta
+            pos += pos & -pos
+
+    def prefix(self, pos):
+        total = 0
+        while pos:
+            total += self.tree[pos]
+            pos -= pos & -pos
+        return total
+
+    def locate(self, index):
+        # Returns (sublist, offset) of the key at absolute position index.
+        pos = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            if pos + step < len(self.tree) and self.tree[pos + step] <= index:
+                pos += step
+                index -= self.tree[pos]
+            step >>= 1
+        return pos, index
+
+    def insert(self, key):
+        if not self.lists:
+            self.lists.append([key])
+            self.maxes.append(key)
+            self.rebuild()
+            return
+        pos = bisect_left(self.maxes, key)
+        if pos == len(self.maxes):
+            pos -= 1
+            self.lists[pos].append(key)
+            self.maxes[pos] = key
+        else:
+            insort(self.lists[pos], key)
+        sublist = self.lists[pos]
+        if len(sublist) > 2 * self.load:
+            half = len(sublist) // 2
+            self.lists[pos:pos + 1] = [sublist[:half], sublist[half:]]
+            self.maxes[pos:pos + 1] = [sublist[half - 1], sublist[-1]]
+            self.rebuild()
+        else:
+            self.grow(pos, 1)
+
+    def remove(self, key):
+        pos = bisect_left(self.maxes, key)
+        sublist = self.lists[pos]
+        del sublist[bisect_left(sublist, key)]
+        if sublist:
+            self.maxes[pos] = sublist[-1]
+            self.grow(pos, -1)
+        else:
+            del self.lists[pos]
+            del self.maxes[pos]
+            self.rebuild()
+
+    def update(self, user_id, balance):
+        old_balance = self.balances.pop(user_id, None)
+        if old_balance is not None:
+            self.remove((-old_balance, user_id))
+        if balance > 0:
+            self.balances[user_id] = balance
+            self.insert((-balance, user_id))
+
+    def rank(self, user_id):
+        balance = self.balances.get(user_id)
+        if balance is None:
+            return None
+        key = (-balance, user_id)
+        pos = bisect_left(self.maxes, key)
+        return self.prefix(pos) + bisect_left(self.lists[pos], key) + 1
+
+    def slice(self, start, stop):
+        rows = []
+        if start >= len(self):
+            return rows
+        pos, offset = self.locate(start)
+        while pos < len(self.lists) and len(rows) < stop - start:
+            for balance, user_id in self.lists[pos][offset:offset + stop - start - len(rows)]:
+                rows.append((user_id, -balance))
+            pos += 1
+            offset = 0
+        return rows
+
+
+class Leaderboard:
+    # Serves leaderboard pages and ranks from a RankIndex that follows every
+    # ledger commit. Rendered pages are kept until a commit moves someone on
+    # or above them.
+
+    def __init__(self, ledger, storage, names, size=10):
+        self.storage = storage
+        self.names = names
+        self.size = size
+        self.index = RankIndex()
+        self.pages = {}
+        self.version = 0
+        ledger.subscribe(self.on_balances)
+
+    async def load(self):
+        self.index.bulk_load(await self.storage.ranked_balances())
+        self.pages.clear()
+
+    def page_of(self, rank):
+        return (rank - 1) // self.size + 1
+
+    def invalidate_from(self, page):
+        self.version += 1
+        self.pages = {number: text for number, text in self.pages.items() if number < page}
+
+    def on_balances(self, balances):
+        first = None
+        for user_id, balance in balances.items():
+            old_rank = self.index.rank(user_id)
+            self.index.update(user_id, balance)
+            new_rank = self.index.rank(user_id)
+            for rank in (old_rank, new_rank):
+                if rank is not None and (first is None or rank < first):
+                    first = rank
+        if first is not None:
+            self.invalidate_from(self.page_of(first))
+
+    def on_user_update(self, user):
+        rank = self.index.rank(user.id)
+        if self.names.update(user) and rank is not None and self.page_of(rank) in self.pages:
+            del self.pages[self.page_of(rank)]
+
+    def page_count(self):
+        return max(1, -(-len(self.index) // self.size))
+
+    async def render(self, page=1):
+        if page in self.pages:
+            return self.pages[page]
+
+        version = self.version
+        start = (page - 1) * self.size
+        rows = self.index.slice(start, start + self.size)
+        if not rows:
+            return None
+
+        names = await self.names.resolve([user_id for user_id, _ in rows])
+        title = 'Leaderboard:\n' if page == 1 else f'Leaderboard (page {page}):\n'
+        text = title + ''.join(f'{rank}. {names[user_id]}: {balance}\n'
+                               for rank, (user_id, balance) in enumerate(rows, start=start + 1))
+        # Only memoize if no commit reordered the index while names resolved.
+        if version == self.version:
+            self.pages[page] = text
+        return text
+
+    async def neighbours(self, user_id, radius=2):
+        rank = self.index.rank(user_id)
+        if rank is None:
+            return []
+        start = max(0, rank - 1 - radius)
+        rows = self.index.slice(start, rank + radius)
+        names = await self.names.resolve([row_user_id for row_user_id, _ in rows])
+        return [(position, row_user_id, names[row_user_id], balance)
+                for position, (row_user_id, balance) in enumerate(rows, start=start + 1)]
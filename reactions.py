@@ -0,0 +1,24 @@
+class ReactionRouter:
+    # Routes raw reaction events to the game that owns the message. Games
+    # register their message while it takes reactions, so a reaction on any
+    # other message costs one dict lookup. Raw events carry the message id
+    # even when the message is not in the bot's cache.
+
+    def __init__(self):
+        self.handlers = {}
+
+    def __len__(self):
+        return len(self.handlers)
+
+    def register(self, message_id, handler):
+        self.handlers[message_id] = handler
+
+    def unregister(self, message_id):
+        self.handlers.pop(message_id, None)
+
+    async def dispatch(self, payload):
+        handler = self.handlers.get(payload.message_id)
+        if handler is None:
+            return False
+        await handler(payload)
+        return True
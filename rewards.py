@@ -0,0 +1,106 @@
+import time
+from collections import OrderedDict
+
+from ledger import Transaction
+
+# kind: (tokens, seconds between claims)
+REWARDS = {
+    'hourly': (10, 3600),
+    'daily': (100, 86400),
+    'monthly': (5000, 2592000),
+}
+
+# Records a claim only if the last one is at least a full interval old, so
+# the row can never move a reward's clock for a claim that was not due.
+CLAIM_SQL = ('INSERT INTO reward_claims (user_id, kind, claimed_at) VALUES (?, ?, ?) '
+             'ON CONFLICT (user_id, kind) DO UPDATE SET claimed_at = excluded.claimed_at '
+             'WHERE claimed_at <= excluded.claimed_at - ?')
+
+
+def format_remaining(seconds_left):
+    minutes, seconds = divmod(int(seconds_left), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+
+    if days > 0:
+        return f'{days}d {hours}h {minutes}m {seconds}s'
+    elif hours > 0:
+        return f'{hours}h {minutes}m {seconds}s'
+    elif minutes > 0:
+        return f'{minutes}m {seconds}s'
+    return f'{seconds}s'
+
+
+class ClaimStore:
+    # When each user last claimed each reward, from the reward_claims table.
+    # A user's claims are read on first use and kept in a bounded LRU cache.
+    # A claim is recorded in the same ledger transaction that credits it, so
+    # restarts neither lose a claim nor let it be repeated.
+
+    def __init__(self, storage, ledger, capacity=50000):
+        self.storage = storage
+        self.ledger = ledger
+        self.capacity = capacity
+        self.claims = OrderedDict()
+
+    async def load(self, user_id):
+        claims = self.claims.get(user_id)
+        if claims is not None:
+            self.claims.move_to_end(user_id)
+            return claims
+        # A claim evicted from here may still be waiting in the balance cache.
+        await self.ledger.sync()
+        rows = await self.storage.fetchall('SELECT kind, claimed_at FROM reward_claims WHERE user_id = ?', (user_id,))
+        # Another command may have loaded and claimed while we waited.
+        claims = self.claims.get(user_id)
+        if claims is None:
+            claims = self.claims[user_id] = dict(rows)
+            while len(self.claims) > self.capacity:
+                self.claims.popitem(last=False)
+        return claims
+
+    async def claim(self, user_id, kinds=REWARDS):
+        # Claims every eligible reward in kinds with one ledger transaction.
+        # Returns ({kind: tokens}, new balance or None, {kind: seconds left}).
+        claims = await self.load(user_id)
+        now = time.time()
+        claimed, waiting = {}, {}
+        for kind in kinds:
+            tokens, interval = REWARDS[kind]
+            claimed_at = claims.get(kind)
+            if claimed_at is not None and now < claimed_at + interval:
+                waiting[kind] = claimed_at + interval - now
+            else:
+                claimed[kind] = tokens
+        if not claimed:
+            return claimed, None, waiting
+
+        # Reserve the claims before committing, so a second command in
+        # flight for the same user finds them taken.
+        previous = {kind: claims.get(kind) for kind in claimed}
+        claims.update((kind, now) for kind in claimed)
+        txn = Transaction().credit(user_id, sum(claimed.values()))
+        for kind in claimed:
+            txn.execute(CLAIM_SQL, (user_id, kind, now, REWARDS[kind][1]))
+        try:
+            balances = await self.ledger.commit(txn)
+        except BaseException:
+            for kind, claimed_at in previous.items():
+                if claimed_at is None:
+                    claims.pop(kind, None)
+                else:
+                    claims[kind] = claimed_at
+            raise
+        return claimed, balances[user_id], waiting
+
+
+class RemoteClaimStore(ClaimStore):
+    # For shard processes. Claims are made by the ledger service, whose
+    # ClaimStore sees every process's claims, so two processes cannot both
+    # find a reward unclaimed. Nothing is read or cached here.
+
+    def __init__(self, storage, ledger):
+        super().__init__(storage, ledger, capacity=0)
+
+    async def claim(self, user_id, kinds=REWARDS):
+        return await self.ledger.claim(user_id, kinds)
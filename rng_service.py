@@ -0,0 +1,325 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import sys
+import time
+
+import blackjack_engine
+import crash_engine
+import roulette_engine
+import slot_engine
+
+GAMES = ('slots', 'autospin', 'roulette', 'blackjack', 'crash', 'rps')
+RPS_MOVES = ['rock', 'paper', 'scissors']
+
+EPOCH_SQL = 'INSERT INTO rng_epochs (game, terminal, anchor, length, revealed, created) VALUES (?, ?, ?, ?, 0, ?)'
+REVEALED_SQL = 'UPDATE rng_epochs SET revealed = ?, drawn = ? WHERE epoch = ?'
+CLOSED_SQL = 'UPDATE rng_epochs SET closed = 1 WHERE epoch = ?'
+# An epoch left by a closed process: reveal up to the first round still in
+# play, or every round it dealt.
+RELEASE_SQL = 'UPDATE rng_epochs SET revealed = MAX(revealed, MIN(COALESCE(drawn, revealed), ?)) WHERE epoch = ? AND closed = 1'
+
+
+def chain(terminal, length):
+    # Round seeds of one epoch. Each seed is the SHA-256 of the one after
+    # it, and the hash of the first seed is the anchor published before the
+    # epoch is used. Returns the seeds last round first, ready to pop().
+    seeds = [terminal]
+    for _ in range(length):
+        seeds.append(hashlib.sha256(seeds[-1]).digest())
+    anchor = seeds.pop()
+    return seeds, anchor
+
+
+def seed_at(terminal, length, index):
+    seed = terminal
+    for _ in range(length - 1 - index):
+        seed = hashlib.sha256(seed).digest()
+    return seed
+
+
+def parse_label(label):
+    epoch, _, index = label.partition('.')
+    if not (epoch.isdigit() and index.isdigit()):
+        raise KeyError(label)
+    return int(epoch), int(index)
+
+
+class Round:
+    # One round's randomness: every draw the game makes comes from a
+    # random.Random seeded with the round seed, so anyone holding the seed
+    # can reproduce the outcome with the standard library.
+
+    __slots__ = ('game', 'epoch', 'index', 'seed', 'rng')
+
+    def __init__(self, game, epoch, index, seed):
+        self.game = game
+        self.epoch = epoch
+        self.index = index
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    @property
+    def label(self):
+        return f'{self.epoch}.{self.index}'
+
+    @property
+    def commitment(self):
+        # The previous round's seed, or the epoch anchor for the first round.
+        return hashlib.sha256(self.seed).hexdigest()
+
+
+class Epoch:
+    __slots__ = ('epoch', 'game', 'terminal', 'anchor', 'length', 'seeds', 'revealed', 'finished', 'dirty')
+
+    def __init__(self, epoch, game, terminal, anchor, length, seeds):
+        self.epoch = epoch
+        self.game = game
+        self.terminal = terminal
+        self.anchor = anchor
+        self.length = length
+        self.seeds = seeds
+        # Rounds below `revealed` may be shown; rounds finished out of order
+        # wait in `finished`, since a seed gives away every seed before it.
+        self.revealed = 0
+        self.finished = set()
+        self.dirty = False
+
+    @property
+    def drawn(self):
+        return self.length - len(self.seeds)
+
+
+class Stream:
+    __slots__ = ('game', 'current', 'next', 'refill', 'created')
+
+    def __init__(self, game):
+        self.game = game
+        self.current = None
+        self.next = None
+        self.refill = None
+        self.created = 0
+
+
+class RNGService:
+    # Independent streams of provably fair rounds, one per game. A stream
+    # deals from an epoch of `length` round seeds that form a hash chain;
+    # when fewer than `low_water` are left the next epoch is generated on a
+    # worker thread and published, so drawing a round never hashes on the
+    # event loop. With a seed every stream is reproducible; without one the
+    # chains start from os.urandom. Epochs are recorded in rng_epochs so any
+    # revealed round can be replayed later, from any process.
+
+    def __init__(self, storage=None, seed=None, length=4096, low_water=1024, flush_interval=1.0):
+        self.storage = storage
+        self.seed = seed
+        self.length = length
+        self.low_water = low_water
+        self.flush_interval = flush_interval
+        self.streams = {game: Stream(game) for game in GAMES}
+        self.epochs = {}
+        self.flusher = None
+        self.rounds = 0
+
+    async def start(self):
+        for stream in self.streams.values():
+            stream.current = await self.create_epoch(stream)
+        if self.storage is not None:
+            self.flusher = asyncio.create_task(self.flush_loop())
+
+    async def close(self):
+        tasks = [stream.refill for stream in self.streams.values() if stream.refill is not None]
+        if self.flusher is not None:
+            tasks.append(self.flusher)
+            self.flusher = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Rounds still hidden, such as shoes with blackjack games open, stay
+        # hidden; release() reveals them from a later process.
+        closed = list(self.epochs)
+        for epoch in self.epochs.values():
+            epoch.dirty = True
+        await self.flush()
+        if self.storage is not None and closed:
+            async with self.storage.lock:
+                await self.storage.db.executemany(CLOSED_SQL, [(number,) for number in closed])
+                await self.storage.db.commit()
+
+    async def create_epoch(self, stream):
+        if self.seed is None:
+            terminal = os.urandom(32)
+        else:
+            terminal = hashlib.sha256(f'{self.seed}:{stream.game}:{stream.created}'.encode()).digest()
+        stream.created += 1
+        seeds, anchor = await asyncio.to_thread(chain, terminal, self.length)
+        if self.storage is None:
+            number = len(self.epochs) + 1
+        else:
+            async with self.storage.lock:
+                cursor = await self.storage.db.execute(EPOCH_SQL, (stream.game, terminal, anchor, self.length, time.time()))
+                await self.storage.db.commit()
+            number = cursor.lastrowid
+        epoch = self.epochs[number] = Epoch(number, stream.game, terminal, anchor, self.length, seeds)
+        return epoch
+
+    async def prepare(self, stream):
+        try:
+            stream.next = await self.create_epoch(stream)
+        finally:
+            stream.refill = None
+
+    async def round(self, game, hidden=False):
+        # A hidden round stays secret until reveal() is called, for games
+        # whose outcome must not be known while they are being played.
+        stream = self.streams[game]
+        while not stream.current.seeds:
+            if stream.next is not None:
+                stream.current, stream.next = stream.next, None
+            elif stream.refill is not None:
+                await asyncio.shield(stream.refill)
+            else:
+                stream.current = await self.create_epoch(stream)
+        epoch = stream.current
+        index = epoch.drawn
+        result = Round(game, epoch.epoch, index, epoch.seeds.pop())
+        self.rounds += 1
+        if len(epoch.seeds) <= self.low_water and stream.next is None and stream.refill is None:
+            stream.refill = asyncio.create_task(self.prepare(stream))
+        if not hidden:
+            self.reveal(result)
+        return result
+
+    def reveal(self, round):
+        epoch = self.epochs[round.epoch]
+        epoch.finished.add(round.index)
+        while epoch.revealed in epoch.finished:
+            epoch.finished.remove(epoch.revealed)
+            epoch.revealed += 1
+            epoch.dirty = True
+
+    async def release(self, number, held):
+        # Reveals the rounds of epoch `number`, dealt by a process that has
+        # since closed, up to the first of `held`, the indices still in
+        # play. Does nothing for epochs of live processes.
+        if self.storage is None or number in self.epochs:
+            return
+        first = min(held, default=self.length)
+        async with self.storage.lock:
+            await self.storage.db.execute(RELEASE_SQL, (first, number))
+            await self.storage.db.commit()
+
+    def anchors(self):
+        # {game: [(epoch, anchor hex), ...]} for the epochs being dealt and prepared.
+        published = {}
+        for game, stream in self.streams.items():
+            published[game] = [(epoch.epoch, epoch.anchor.hex()) for epoch in (stream.current, stream.next) if epoch is not None]
+        return published
+
+    async def flush(self):
+        dirty = [epoch for epoch in self.epochs.values() if epoch.dirty]
+        if not dirty or self.storage is None:
+            return
+        for epoch in dirty:
+            epoch.dirty = False
+        async with self.storage.lock:
+            await self.storage.db.executemany(REVEALED_SQL, [(epoch.revealed, epoch.drawn, epoch.epoch) for epoch in dirty])
+            await self.storage.db.commit()
+        # Epochs this stream has moved past are kept only in the table.
+        for epoch in dirty:
+            stream = self.streams[epoch.game]
+            if epoch is not stream.current and epoch is not stream.next and epoch.revealed == epoch.drawn:
+                del self.epochs[epoch.epoch]
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as error:
+                print(f'Recording revealed rounds failed: {error!r}')
+
+    async def replay(self, label, force=False):
+        # The Round behind a label such as '12.345', with the generator
+        # reset to its start. Raises KeyError for unknown rounds and
+        # ValueError for rounds that have not been revealed yet, unless
+        # forced.
+        number, index = parse_label(label)
+        epoch = self.epochs.get(number)
+        if epoch is not None:
+            game, terminal, length, revealed = epoch.game, epoch.terminal, epoch.length, epoch.revealed
+        elif self.storage is not None:
+            row = await self.storage.fetchone('SELECT game, terminal, length, revealed FROM rng_epochs WHERE epoch = ?', (number,))
+            if row is None:
+                raise KeyError(label)
+            game, terminal, length, revealed = row
+        else:
+            raise KeyError(label)
+        if not 0 <= index < length:
+            raise KeyError(label)
+        if index >= revealed and not force:
+            raise ValueError(f'round {label} has not been revealed yet')
+        seed = await asyncio.to_thread(seed_at, terminal, length, index)
+        return Round(game, number, index, seed)
+
+    def metrics(self):
+        return {'rounds': self.rounds, 'epochs': len(self.epochs)}
+
+
+def describe(round, count=None):
+    # The outcome of a replayed round, drawn exactly as the game draws it.
+    rng = round.rng
+    if round.game == 'slots':
+        return slot_engine.render(slot_engine.spin(rng))
+    if round.game == 'autospin':
+        if count is None:
+            return 'Pass the number of spins to replay an autospin round.'
+        result = slot_engine.autospin(1, count, rng)
+        return f'{count} spins: {result.wins} winning, paying {result.payout}x the wager in total.'
+    if round.game == 'roulette':
+        return f'The ball landed on {roulette_engine.landed(roulette_engine.spin_frames(roulette_engine.SPIN_FRAMES, rng))}.'
+    if round.game == 'crash':
+        return f'The multiplier crashed at {crash_engine.crash_threshold(rng):.2f}x.'
+    if round.game == 'blackjack':
+        shoe = blackjack_engine.Shoe(rng=rng)
+        return f'Shoe order: {list(shoe.cards)}'
+    if round.game == 'rps':
+        return f"The bot played {rng.choice(RPS_MOVES)}."
+    return f'Unknown game {round.game!r}.'
+
+
+async def replay(database, label, force=False):
+    from storage import Storage
+
+    storage = Storage(database)
+    await storage.open()
+    try:
+        round = await RNGService(storage).replay(label, force)
+    finally:
+        await storage.close()
+    return round
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a revealed round from its label.')
+    parser.add_argument('label', help="round label such as '12.345'")
+    parser.add_argument('--count', type=int, default=None, help='number of spins, for autospin rounds')
+    parser.add_argument('--database', default='leaderboard.db')
+    parser.add_argument('--force', action='store_true', help='replay rounds that have not been revealed, for investigating disputes')
+    args = parser.parse_args()
+    try:
+        round = asyncio.run(replay(args.database, args.label, args.force))
+    except KeyError:
+        sys.exit(f'There is no round {args.label}.')
+    except ValueError as error:
+        sys.exit(f'{error}; pass --force to replay it anyway.')
+    print(f'Round {round.label} ({round.game})')
+    print(f'Seed:       {round.seed.hex()}')
+    print(f'Commitment: {round.commitment}')
+    print(describe(round, args.count))
+
+
+if __name__ == '__main__':
+    main()
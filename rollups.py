@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+
+from ledger import Transaction
+from round_log import GAME_NAMES, RECORD
+
+GAMES = ('slots', 'roulette', 'blackjack', 'crash')
+
+# Each statement adds one round (or autospin batch) to its row, so rounds
+# may commit in any order.
+USER_SQL = ('INSERT INTO user_stats (user_id, game, rounds, wagered, paid, biggest_win) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (user_id, game) DO UPDATE SET rounds = rounds + excluded.rounds, '
+            'wagered = wagered + excluded.wagered, paid = paid + excluded.paid, biggest_win = MAX(biggest_win, excluded.biggest_win)')
+HOUSE_SQL = ('INSERT INTO house_stats (game, rounds, wagered, paid) VALUES (?, ?, ?, ?) '
+             'ON CONFLICT (game) DO UPDATE SET rounds = rounds + excluded.rounds, '
+             'wagered = wagered + excluded.wagered, paid = paid + excluded.paid')
+
+
+class Totals:
+    __slots__ = ('rounds', 'wagered', 'paid', 'biggest_win')
+
+    def __init__(self, rounds=0, wagered=0, paid=0, biggest_win=0):
+        self.rounds = rounds
+        self.wagered = wagered
+        self.paid = paid
+        self.biggest_win = biggest_win
+
+    def add(self, rounds, wager, payout, biggest_win=None):
+        if biggest_win is None:
+            biggest_win = payout - wager
+        return Totals(self.rounds + rounds, self.wagered + wager, self.paid + payout,
+                      max(self.biggest_win, biggest_win))
+
+    @property
+    def net(self):
+        return self.paid - self.wagered
+
+
+EMPTY = Totals()
+
+
+class Rollups:
+    # Running totals per player and game (user_stats) and per game
+    # (house_stats), updated in the same ledger transaction that settles
+    # each round. The ledger runs a transaction's statements exactly once,
+    # so each round adds its own figures to the rows and nothing is held
+    # between rounds: settlements commit concurrently, as they did before,
+    # and shard processes add to the same rows.
+
+    def __init__(self, storage, ledger):
+        self.storage = storage
+        self.ledger = ledger
+
+    async def commit(self, txn, user_id, game, wager, payout, rounds=1, biggest_win=None):
+        # Commits txn with the round's totals added to it; returns the new
+        # balances like Ledger.commit. txn may have no legs, for a round
+        # whose stake was taken earlier and which paid nothing. A batch of
+        # rounds passes its best single round as biggest_win.
+        if biggest_win is None:
+            biggest_win = payout - wager
+        txn.execute(USER_SQL, (user_id, game, rounds, wager, payout, max(biggest_win, 0)))
+        txn.execute(HOUSE_SQL, (game, rounds, wager, payout))
+        return await self.ledger.commit(txn)
+
+    async def settle(self, user_id, game, stake, payout, rounds=1, biggest_win=None):
+        # Ledger.settle with the round recorded.
+        txn = Transaction().debit(user_id, stake).credit(user_id, payout)
+        balances = await self.commit(txn, user_id, game, stake, payout, rounds, biggest_win)
+        return balances[user_id]
+
+    async def player(self, user_id):
+        # {game: Totals}: one row per game, whatever the player's history.
+        await self.ledger.sync()
+        rows = await self.storage.fetchall('SELECT game, rounds, wagered, paid, biggest_win FROM user_stats WHERE user_id = ?',
+                                           (user_id,))
+        return {game: Totals(*values) for game, *values in rows}
+
+    async def house_totals(self):
+        await self.ledger.sync()
+        rows = await self.storage.fetchall('SELECT game, rounds, wagered, paid FROM house_stats')
+        return {game: Totals(*values) for game, *values in rows}
+
+
+def read_totals(log_path, chunk=1 << 16):
+    # ({(user_id, game): Totals}, {game: Totals}) from the round log.
+    # Autospin batches count as slots rounds, one per spin; the log does not
+    # say how much their best spin won, so they leave biggest_win alone.
+    players, house = {}, {}
+    with open(log_path, 'rb') as log:
+        while True:
+            data = log.read(RECORD.size * chunk)
+            usable = len(data) - len(data) % RECORD.size
+            if not usable:
+                break
+            for _, user_id, wager, payout, code, outcome in RECORD.iter_unpack(data[:usable]):
+                game, rounds, biggest_win = GAME_NAMES.get(code), 1, None
+                if game == 'autospin':
+                    game, rounds, biggest_win = 'slots', outcome, 0
+                if game not in GAMES:
+                    continue
+                key = (user_id, game)
+                players[key] = players.get(key, EMPTY).add(rounds, wager, payout, biggest_win)
+                house[game] = house.get(game, EMPTY).add(rounds, wager, payout)
+    return players, house
+
+
+async def backfill(storage, log_path):
+    # Rebuilds both tables from the round log. Run it while the bot is
+    # stopped.
+    players, house = await asyncio.to_thread(read_totals, log_path)
+    async with storage.lock:
+        try:
+            await storage.db.execute('DELETE FROM user_stats')
+            await storage.db.execute('DELETE FROM house_stats')
+            await storage.db.executemany(USER_SQL, ((user_id, game, totals.rounds, totals.wagered, totals.paid, totals.biggest_win)
+                                                    for (user_id, game), totals in players.items()))
+            await storage.db.executemany(HOUSE_SQL, ((game, totals.rounds, totals.wagered, totals.paid)
+                                                     for game, totals in house.items()))
+            await storage.db.commit()
+        except BaseException:
+            await storage.db.rollback()
+            raise
+    return len(players), sum(totals.rounds for totals in house.values())
+
+
+async def run_backfill(database, log_path):
+    from storage import Storage
+
+    storage = Storage(database)
+    await storage.open()
+    try:
+        return await backfill(storage, log_path)
+    finally:
+        await storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the player and house statistics from the round log.')
+    parser.add_argument('--database', default='leaderboard.db')
+    parser.add_argument('--log', default='rounds.log')
+    args = parser.parse_args()
+    rows, rounds = asyncio.run(run_backfill(args.database, args.log))
+    print(f'Rebuilt {rows:,} player rows from {rounds:,} rounds')
+
+
+if __name__ == '__main__':
+    main()
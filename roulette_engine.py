@@ -0,0 +1,32 @@
+import random
+
+EMOJI_COLORS = {
+    "green": "🟢",
+    "red": "🟥",
+    "black": "⬛"
+}
+WHEEL = ["green"] + ["red", "black"] * 18
+SPIN_FRAMES = 10
+
+
+def calculate_payout(wager, bet, spin_result):
+    if bet.lower() == "red" and spin_result == "red":
+        return wager * 2
+    elif bet.lower() == "black" and spin_result == "black":
+        return wager * 2
+    elif bet.lower() == "green" and spin_result == "green":
+        return wager * 36
+    elif bet.isdigit() and int(bet) in range(1, 37) and spin_result != "green":
+        if (int(bet) % 2 == 0 and spin_result == "red") or (int(bet) % 2 == 1 and spin_result == "black"):
+            return wager * 36
+    return 0
+
+
+def spin_frames(frames, rng=random):
+    # Each frame shows five pockets; the middle pocket of the last frame is
+    # where the ball lands.
+    return [[rng.choice(WHEEL) for _ in range(5)] for _ in range(frames)]
+
+
+def landed(frames):
+    return frames[-1][2]
@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import os
+import struct
+import time
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:  # Only the analytics reader needs NumPy.
+    np = None
+
+# One settled round: milliseconds since the epoch, user id, wager, payout,
+# game code and outcome code, padded to 40 bytes so every field is aligned.
+RECORD = struct.Struct('<qqqqB3xI')
+
+GAMES = {'slots': 1, 'autospin': 2, 'roulette': 3, 'blackjack': 4, 'crash': 5, 'rps': 6}
+GAME_NAMES = {code: game for game, code in GAMES.items()}
+
+# Outcome codes:
+#   slots      middle row as symbol indices, 49 * first + 7 * second + third
+#   autospin   number of spins
+#   roulette   pocket colour, 0 green, 1 red, 2 black
+#   blackjack  dealer's final total
+#   crash      cash-out multiplier in hundredths, 0 if the player crashed
+#   rps        the bot's move, 0 rock, 1 paper, 2 scissors
+
+DAY_MS = 86400 * 1000
+
+
+class RoundLog:
+    # Appends settled rounds to a binary log. record() only packs the round
+    # into a buffer; a background task hands the buffer to a worker thread
+    # every `interval` seconds, or sooner once it holds `limit` bytes. The
+    # file is opened with O_APPEND and every write is a whole number of
+    # records, so several bot processes can share one log.
+
+    def __init__(self, path, interval=1.0, limit=1 << 20):
+        self.path = path
+        self.interval = interval
+        self.limit = limit
+        self.buffer = bytearray()
+        self.fd = None
+        self.writer = None
+        self.wake = asyncio.Event()
+        self.rounds = 0
+        self.writes = 0
+
+    async def start(self):
+        self.fd = await asyncio.to_thread(self.open)
+        self.writer = asyncio.create_task(self.run())
+
+    def open(self):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        # A record torn by a crash would misalign everything after it.
+        size = os.fstat(fd).st_size
+        if size % RECORD.size:
+            os.ftruncate(fd, size - size % RECORD.size)
+        return fd
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.cancel()
+            await asyncio.gather(self.writer, return_exceptions=True)
+            self.writer = None
+        if self.fd is not None:
+            await self.flush()
+            os.close(self.fd)
+            self.fd = None
+
+    def record(self, user_id, game, wager, payout, outcome=0):
+        self.buffer += RECORD.pack(int(time.time() * 1000), user_id, wager, payout, GAMES[game], outcome)
+        self.rounds += 1
+        if len(self.buffer) >= self.limit:
+            self.wake.set()
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            written = os.write(self.fd, view)
+            view = view[written:]
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        data, self.buffer = self.buffer, bytearray()
+        await asyncio.to_thread(self.write, data)
+        self.writes += 1
+
+    async def run(self):
+        while True:
+            # asyncio.wait rather than wait_for, which on Python 3.11 can
+            # swallow the cancellation from close() if the event fires at
+            # the same moment.
+            waiter = asyncio.ensure_future(self.wake.wait())
+            try:
+                await asyncio.wait((waiter,), timeout=self.interval)
+            finally:
+                waiter.cancel()
+            self.wake.clear()
+            try:
+                await self.flush()
+            except Exception as error:
+                print(f'Writing the round log failed: {error!r}')
+
+    def metrics(self):
+        return {'rounds': self.rounds, 'writes': self.writes, 'buffered': len(self.buffer)}
+
+
+def dtype():
+    return np.dtype([('time', '<i8'), ('user', '<i8'), ('wager', '<i8'), ('payout', '<i8'),
+                     ('game', 'u1'), ('pad', 'V3'), ('outcome', '<u4')])
+
+
+def open_log(path):
+    # The whole log as a read-only memory-mapped record array; a partly
+    # written last record is left out.
+    if np is None:
+        raise RuntimeError('reading the round log needs NumPy: pip install numpy')
+    count = os.path.getsize(path) // RECORD.size
+    if count == 0:
+        return np.zeros(0, dtype=dtype())
+    return np.memmap(path, dtype=dtype(), mode='r', shape=(count,))
+
+
+def house_profit_by_day(rounds, chunk=1 << 24):
+    # {(day, game): (rounds, wagered, paid out)} with day as a date. Works
+    # through the log in chunks so memory stays bounded by `chunk` records
+    # whatever the size of the log.
+    if len(rounds) == 0:
+        return {}
+    first = int(rounds['time'][0]) // DAY_MS
+    last = int(rounds['time'][-1]) // DAY_MS
+    # Several processes append to the log, so it is only roughly in order.
+    first, last = first - 1, last + 1
+    width = 256
+    bins = (last - first + 1) * width
+    counts = np.zeros(bins, dtype=np.int64)
+    wagered = np.zeros(bins, dtype=np.float64)
+    paid = np.zeros(bins, dtype=np.float64)
+    for start in range(0, len(rounds), chunk):
+        part = rounds[start:start + chunk]
+        days = part['time'] // DAY_MS
+        if days.min() < first or days.max() > last:
+            raise ValueError('round log timestamps are out of order by more than a day')
+        keys = (days - first) * width + part['game']
+        counts += np.bincount(keys, minlength=bins)
+        wagered += np.bincount(keys, weights=part['wager'], minlength=bins)
+        paid += np.bincount(keys, weights=part['payout'], minlength=bins)
+    totals = {}
+    for key in np.flatnonzero(counts):
+        day, game = divmod(int(key), width)
+        date = datetime.fromtimestamp((first + day) * 86400, timezone.utc).date()
+        totals[date, GAME_NAMES.get(game, str(game))] = (int(counts[key]), int(wagered[key]), int(paid[key]))
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='House profit per game per day from the round log.')
+    parser.add_argument('--log', default='rounds.log')
+    args = parser.parse_args()
+    begin = time.perf_counter()
+    rounds = open_log(args.log)
+    totals = house_profit_by_day(rounds)
+    elapsed = time.perf_counter() - begin
+    print(f'{"day":<10} {"game":<10} {"rounds":>12} {"wagered":>16} {"paid out":>16} {"house profit":>16}')
+    for (day, game), (count, wagered, paid) in sorted(totals.items()):
+        print(f'{day.isoformat():<10} {game:<10} {count:>12,} {wagered:>16,} {paid:>16,} {wagered - paid:>16,}')
+    print(f'{len(rounds):,} rounds in {elapsed:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import argparse
+from fractions import Fraction
+from functools import lru_cache
+from math import sqrt
+
+import slot_engine
+
+
+class SlotReport:
+    # Exact figures for one paytable, per unit wagered, from enumerating
+    # every middle row with its exact probability.
+
+    def __init__(self, rows):
+        self.rows = rows  # (row, multiplier, probability), biggest contribution first
+        self.rtp = sum(multiplier * probability for _, multiplier, probability in rows)
+        self.hit_frequency = sum(probability for _, multiplier, probability in rows if multiplier)
+        self.variance = sum(multiplier * multiplier * probability for _, multiplier, probability in rows) - self.rtp ** 2
+
+    def contributions(self):
+        return [(row, multiplier, probability, multiplier * probability / self.rtp)
+                for row, multiplier, probability in self.rows if multiplier]
+
+    def format(self, top=None):
+        lines = [
+            f'RTP: {float(self.rtp):.4%} (house edge {float(1 - self.rtp):.4%})',
+            f'Hit frequency: {float(self.hit_frequency):.4%} (1 in {float(1 / self.hit_frequency):.2f})',
+            f'Variance: {float(self.variance):.4f} (std dev {sqrt(self.variance):.4f} per token wagered)',
+            'Contribution to RTP:',
+        ]
+        for row, multiplier, probability, share in self.contributions()[:top]:
+            lines.append(f'{"".join(row)} {multiplier}x  p=1 in {float(1 / probability):.1f}  {float(share):.2%}')
+        mismatches = check_display(slot_engine.winning_combinations, slot_engine.partial_combinations)
+        if mismatches:
+            lines.append('Display mismatches:')
+            lines.extend(mismatches)
+        else:
+            lines.append('Display check: winning and partial combinations match the paytable.')
+        return '\n'.join(lines)
+
+
+@lru_cache(maxsize=None)
+def analyze_table(items, weights, multipliers):
+    total = sum(weights)
+    weight_of = dict(zip(items, weights))
+    rows = []
+    for row, multiplier in zip(slot_engine.PAYTABLE, multipliers):
+        probability = Fraction(weight_of[row[0]] * weight_of[row[1]] * weight_of[row[2]], total ** 3)
+        rows.append((row, multiplier, probability))
+    rows.sort(key=lambda entry: entry[1] * entry[2], reverse=True)
+    return SlotReport(rows)
+
+
+def analyze():
+    # Cached per paytable, so the enumeration only reruns when the weights or
+    # payouts in slot_engine change.
+    return analyze_table(tuple(slot_engine.SLOT_ITEMS), tuple(slot_engine.WEIGHTS),
+                         tuple(slot_engine.PAYTABLE.values()))
+
+
+def parse_pattern(pattern):
+    # "🍒🍒 ANY" -> ['🍒', '🍒', None]
+    symbols = []
+    for token in pattern.split():
+        if token == 'ANY':
+            symbols.append(None)
+        else:
+            symbols.extend(token)
+    return symbols
+
+
+def check_display(winning, partial):
+    # The multiplier a player would expect for a row is the best matching
+    # entry on the !distribution card; report every row that pays otherwise.
+    shown = []
+    for pattern, multiplier in list(winning.items()) + list(partial.items()):
+        shown.append((parse_pattern(pattern), int(multiplier.rstrip('x')), pattern))
+
+    mismatches = {}
+    for row, actual in slot_engine.PAYTABLE.items():
+        expected, source = 0, None
+        for symbols, multiplier, pattern in shown:
+            if all(symbol is None or symbol == cell for symbol, cell in zip(symbols, row)) and multiplier > expected:
+                expected, source = multiplier, pattern
+        if expected != actual:
+            key = (source, expected, actual)
+            mismatches.setdefault(key, []).append(''.join(row))
+
+    messages = []
+    for (source, expected, actual), rows in mismatches.items():
+        shown_as = f'"{source}" shows {expected}x' if source else 'not shown'
+        examples = ', '.join(rows[:3]) + (f' and {len(rows) - 3} more' if len(rows) > 3 else '')
+        messages.append(f'{examples}: {shown_as} but pays {actual}x')
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exact RTP and variance of the slot machine paytable.')
+    parser.add_argument('--top', type=int, default=None, help='only list the N biggest contributions')
+    args = parser.parse_args()
+    print(analyze().format(args.top))
+
+
+if __name__ == '__main__':
+    main()
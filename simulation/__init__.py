@@ -0,0 +1,2 @@
+from simulation.games import GAMES
+from simulation.runner import SimulationResult, simulate
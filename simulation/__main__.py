@@ -0,0 +1,33 @@
+import argparse
+
+from simulation import GAMES, simulate
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m simulation',
+                                     description='Monte Carlo simulation of the bot games without Discord.')
+    parser.add_argument('games', nargs='*', metavar='game',
+                        help=f'games to simulate: {", ".join(GAMES)} (default: all)')
+    parser.add_argument('--rounds', type=int, default=10000000)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--bet', default='red', help='roulette bet: red, black, green or a number')
+    parser.add_argument('--cash-out', type=float, default=2.0, help='crash multiplier to pull out at')
+    parser.add_argument('--stand-on', type=int, default=17, help='blackjack total to stand on')
+    args = parser.parse_args()
+    for game in args.games:
+        if game not in GAMES:
+            parser.error(f'unknown game {game!r}')
+
+    options = {
+        'roulette': {'bet': args.bet},
+        'crash': {'cash_out': args.cash_out},
+        'blackjack': {'stand_on': args.stand_on},
+    }
+    for game in args.games or GAMES:
+        result = simulate(game, args.rounds, workers=args.workers, seed=args.seed, **options.get(game, {}))
+        print(result.format())
+
+
+if __name__ == '__main__':
+    main()
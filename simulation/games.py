@@ -0,0 +1,71 @@
+from collections import Counter
+
+import slot_engine
+import roulette_engine
+import crash_engine
+from blackjack_engine import Shoe, calculate_hand_value, dealer_play, resolve_hand
+
+# Each game plays `rounds` rounds of one unit wager with the bot's own game
+# logic and returns (sum of returns, sum of squared returns), where a
+# round's return is the amount paid back per token staked.
+
+SLOT_BATCH = 100000
+BLACKJACK_BET = 100
+
+
+def slots(rounds, rng):
+    total = squares = 0
+    while rounds > 0:
+        batch = min(rounds, SLOT_BATCH)
+        for row, hits in slot_engine.spin_rows(batch, rng).items():
+            multiplier = slot_engine.PAYTABLE[row]
+            total += multiplier * hits
+            squares += multiplier * multiplier * hits
+        rounds -= batch
+    return total, squares
+
+
+def roulette(rounds, rng, bet='red'):
+    total = squares = 0
+    for spin_result, hits in Counter(rng.choices(roulette_engine.WHEEL, k=rounds)).items():
+        multiplier = roulette_engine.calculate_payout(1, bet, spin_result)
+        total += multiplier * hits
+        squares += multiplier * multiplier * hits
+    return total, squares
+
+
+def blackjack(rounds, rng, stand_on=17):
+    # The player hits until reaching stand_on; the dealer plays out its hand
+    # from the same shoe, as check_game_status does.
+    shoe = Shoe(rng=rng)
+    total = squares = 0
+    for _ in range(rounds):
+        shoe.start_round()
+        player = [shoe.draw(), shoe.draw()]
+        dealer = [shoe.draw(), shoe.draw()]
+        while calculate_hand_value(player) < stand_on:
+            player.append(shoe.draw())
+        player_value = calculate_hand_value(player)
+        dealer_value = dealer_play(dealer, shoe.draw) if player_value <= 21 else calculate_hand_value(dealer)
+        _, winnings = resolve_hand(player_value, dealer_value, BLACKJACK_BET)
+        multiplier = max(winnings, 0) / BLACKJACK_BET
+        total += multiplier
+        squares += multiplier * multiplier
+    return total, squares
+
+
+def crash(rounds, rng, cash_out=2.0):
+    # The player pulls out as soon as the multiplier reaches cash_out.
+    wins = 0
+    for _ in range(rounds):
+        if crash_engine.crash_threshold(rng) > cash_out:
+            wins += 1
+    return wins * cash_out, wins * cash_out * cash_out
+
+
+GAMES = {
+    'slots': slots,
+    'roulette': roulette,
+    'blackjack': blackjack,
+    'crash': crash,
+}
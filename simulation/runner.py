@@ -0,0 +1,63 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from math import sqrt
+
+from simulation.games import GAMES
+
+CHUNK_ROUNDS = 1000000
+
+
+def run_chunk(game, rounds, seed, options):
+    # Every chunk gets its own generator seeded with 128 fresh bits, so the
+    # workers draw from independent streams and a run is reproducible from
+    # the master seed.
+    rng = random.Random(seed)
+    total, squares = GAMES[game](rounds, rng, **options)
+    return rounds, total, squares
+
+
+class SimulationResult:
+    def __init__(self, game, rounds, total, squares, seconds):
+        self.game = game
+        self.rounds = rounds
+        self.rtp = total / rounds
+        self.variance = max(squares / rounds - self.rtp ** 2, 0.0)
+        self.seconds = seconds
+
+    @property
+    def margin(self):
+        # Half-width of the 95% confidence interval for the RTP.
+        return 1.96 * sqrt(self.variance / self.rounds)
+
+    @property
+    def rounds_per_second(self):
+        return self.rounds / self.seconds if self.seconds else float('inf')
+
+    def format(self):
+        return (f'{self.game:>9}: RTP {self.rtp:.4%} ± {self.margin:.4%} (95% CI), '
+                f'std dev {sqrt(self.variance):.3f}, '
+                f'{self.rounds:,} rounds in {self.seconds:.1f}s ({self.rounds_per_second:,.0f} rounds/s)')
+
+
+def simulate(game, rounds, workers=None, seed=None, chunk_rounds=CHUNK_ROUNDS, **options):
+    master = random.Random(seed)
+    chunks = []
+    remaining = rounds
+    while remaining > 0:
+        size = min(remaining, chunk_rounds)
+        chunks.append(size)
+        remaining -= size
+    seeds = [master.getrandbits(128) for _ in chunks]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(run_chunk, game, size, chunk_seed, options) for size, chunk_seed in zip(chunks, seeds)]
+        played = total = squares = 0
+        for future in futures:
+            chunk_played, chunk_total, chunk_squares = future.result()
+            played += chunk_played
+            total += chunk_total
+            squares += chunk_squares
+    return SimulationResult(game, played, total, squares, time.perf_counter() - start)
@@ -1,803 +1,924 @@
-import os
-import random
-import aiosqlite
-import discord
-import asyncio
-from dotenv import load_dotenv
-from discord.ext import commands
-from discord import Intents
-from discord.ext.commands import BucketType, cooldown, CommandOnCooldown
-from datetime import datetime, timedelta
-from collections import defaultdict
-
-load_dotenv()
-TOKEN = os.getenv('DISCORD_TOKEN')
-
-intents = Intents.all()
-intents.typing = False
-intents.presences = False
-
-bot = commands.Bot(command_prefix='!', intents=intents, help_command=None)
-
-async def get_user_score(user_id: int):
-    async with aiosqlite.connect('leaderboard.db') as db:
-        cursor = await db.execute('SELECT score FROM scores WHERE user_id = ?', (user_id,))
-        result = await cursor.fetchone()
-        await cursor.close()
-        return result[0] if result else None
-
-async def update_user_score(user_id: int, new_score: int):
-    async with aiosqlite.connect('leaderboard.db') as db:
-        await db.execute('INSERT OR REPLACE INTO scores (user_id, score) VALUES (?, ?)', (user_id, new_score))
-        await db.commit()
-
-async def get_balance(user_id: int):
-    async with aiosqlite.connect('leaderboard.db') as db:
-        cursor = await db.execute('SELECT balance FROM balances WHERE user_id = ?', (user_id,))
-        result = await cursor.fetchone()
-        await cursor.close()
-        return result[0] if result else None
-
-async def add_balance(user_id: int, amount: int):
-    async with aiosqlite.connect('leaderboard.db') as db:
-        current_balance = await get_balance(user_id) or 0
-        await db.execute('INSERT OR REPLACE INTO balances (user_id, balance) VALUES (?, ?)', (user_id, current_balance + amount))
-        await db.commit()
-
-async def subtract_balance(user_id: int, amount: int):
-    async with aiosqlite.connect('leaderboard.db') as db:
-        current_balance = await get_balance(user_id) or 0
-        await db.execute('INSERT OR REPLACE INTO balances (user_id, balance) VALUES (?, ?)', (user_id, current_balance - amount))
-        await db.commit()
-
-async def create_tables():
-    async with aiosqlite.connect('leaderboard.db') as db:
-        await db.execute('CREATE TABLE IF NOT EXISTS scores (user_id INTEGER PRIMARY KEY, score INTEGER)')
-        await db.execute('CREATE TABLE IF NOT EXISTS balances (user_id INTEGER PRIMARY KEY, balance INTEGER)')
-        await db.commit()
-
-@bot.event
-async def on_ready():
-    await create_tables()
-    print(f'{bot.user.name} has connected to Discord!')
-
-@bot.event
-async def on_command_error(ctx, error):
-    if isinstance(error, CommandOnCooldown):
-        seconds_left = int(error.retry_after)
-        minutes, seconds = divmod(seconds_left, 60)
-        hours, minutes = divmod(minutes, 60)
-        days, hours = divmod(hours, 24)
-
-        if days > 0:
-            remaining_time = f'{days}d {hours}h {minutes}m {seconds}s'
-        elif hours > 0:
-            remaining_time = f'{hours}h {minutes}m {seconds}s'
-        elif minutes > 0:
-            remaining_time = f'{minutes}m {seconds}s'
-        else:
-            remaining_time = f'{seconds}s'
-
-        await ctx.send(f'{ctx.author.mention}, you can use this command again in {remaining_time}.')
-    else:
-        raise error
-
-
-@bot.command(name='slots', help='Play the slot machine')
-async def slots(ctx, wager: int = None):
-    if wager is None:
-        await ctx.send(f"{ctx.author.mention}, please specify a wager! Usage: !slots <wager>")
-        return
-
-    user_id = ctx.author.id
-    current_balance = await get_balance(user_id) or 0
-
-    if current_balance < wager or wager <= 0:
-        await ctx.send(f'{ctx.author.mention}, you do not have enough tokens to wager {wager}!')
-        return
-
-    await subtract_balance(user_id, wager)
-
-    slot_items = ['💰', '💵', '🍉', '🔔', '🍑', '🍎', '🍒']
-    weights = [1, 3, 2, 1, 7, 5, 2]
-    total_weight = sum(weights)
-
-    grid = [random.choices(slot_items, weights, k=3) for _ in range(3)]
-
-    slot_output = f'''
--====:|$|:====-
-[{grid[0][0]} : {grid[0][1]} : {grid[0][2]}]
-[{grid[1][0]} : {grid[1][1]} : {grid[1][2]}]
-[{grid[2][0]} : {grid[2][1]} : {grid[2][2]}]
-'''
-
-    await ctx.send(slot_output)
-
-    row = grid[1]
-
-    def calculate_payout(symbols, wager):
-        if symbols[0] == symbols[1] == symbols[2]:
-            if symbols[0] == '💰':
-                return wager * 200
-            elif symbols[0] == '💵':
-                return wager * 100
-            elif symbols[0] == '🍉':
-                return wager * 100
-            elif symbols[0] == '🔔':
-                return wager * 18
-            elif symbols[0] == '🍑':
-                return wager * 14
-            elif symbols[0] == '🍎':
-                return wager * 10
-        elif symbols[0] == symbols[1] == '🍉' and symbols[2] == '💵':
-            return wager * 100
-        elif symbols[0] == symbols[1] == '🔔' and symbols[2] == '💵':
-            return wager * 18
-        elif symbols[0] == symbols[1] == '🍑' and symbols[2] == '💵':
-            return wager * 14
-        elif symbols[0] == symbols[1] == '🍎' and symbols[2] == '💵':
-            return wager * 10
-        elif symbols[0] == symbols[1] == '🍒':
-            return wager * 5
-        elif symbols[0] == '🍒' and symbols[1] != symbols[2]:
-            return wager * 2
-        else:
-            return 0
-        
-    def calculate_odds(roll, weights, slot_items):
-        odds = 1
-        for symbol in roll:
-            symbol_weight = weights[slot_items.index(symbol)]
-            total_weight = sum(weights)
-            odds *= symbol_weight / total_weight
-        return odds
-
-
-    payout = calculate_payout(row, wager)
-    roll_odds = calculate_odds(row, weights, slot_items)
-    new_balance = current_balance - wager + payout
-
-    if payout > 0:
-        await add_balance(user_id, payout)
-        await ctx.send(f'{ctx.author.mention} has won {payout} tokens! Your new balance is {new_balance} tokens.')
-    else:
-        lost_amount = wager
-        await ctx.send(f'{ctx.author.mention} has lost {lost_amount} tokens. Your new balance is {new_balance} tokens.')
-
-    await ctx.send(f"The odds of this roll were 1 in {1/roll_odds:.2f}.")
-
-@bot.command(name='leaderboard', help='Display the leaderboard')
-async def leaderboard(ctx):
-    async with aiosqlite.connect('leaderboard.db') as db:
-        cursor = await db.execute('SELECT user_id, balance FROM balances WHERE balance > 0 ORDER BY balance DESC')
-        rows = await cursor.fetchall()
-        await cursor.close()
-
-    if not rows:
-        await ctx.send('No balances found on the leaderboard.')
-        return
-
-    leaderboard_text = 'Leaderboard:\n'
-    for index, row in enumerate(rows[:10], start=1):
-        user_id, balance = row
-        user = await bot.fetch_user(user_id)
-        leaderboard_text += f'{index}. {user.name}: {balance}\n'
-
-    await ctx.send(leaderboard_text)
-
-# Add alias for balance command
-@bot.command(name='balance', aliases=['bal'], help='Check your current token balance')
-async def balance(ctx):
-    user_id = ctx.author.id
-    current_balance = await get_balance(user_id) or 0
-    await ctx.send(f'{ctx.author.mention}, your current balance is {current_balance} tokens.')
-
-@bot.command(name='daily', help='Claim daily reward')
-@cooldown(1, 86400, BucketType.user)  # Allow one claim per user every 24 hours (86400 seconds)
-async def daily(ctx):
-    user_id = ctx.author.id
-    daily_reward = 100
-    await add_balance(user_id, daily_reward)
-    await ctx.send(f"{ctx.author.mention} has claimed {daily_reward} tokens as their daily reward!")
-
-@bot.command(name='hourly', help='Claim hourly reward')
-@cooldown(1, 3600, BucketType.user)  # Allow one claim per user every hour (3600 seconds)
-async def hourly(ctx):
-    user_id = ctx.author.id
-    hourly_reward = 10
-    await add_balance(user_id, hourly_reward)
-    await ctx.send(f"{ctx.author.mention} has claimed {hourly_reward} tokens as their hourly reward!")
-
-@bot.command(name='monthly', help='Claim monthly reward')
-@cooldown(1, 2592000, BucketType.user)  # Allow one claim per user every 30 days (2592000 seconds)
-async def monthly(ctx):
-    user_id = ctx.author.id
-    monthly_reward = 5000
-    await add_balance(user_id, monthly_reward)
-    await ctx.send(f"{ctx.author.mention} has claimed {monthly_reward} tokens as their monthly reward!")
-
-@bot.command(name='helps', help='Display the help menu')
-async def helps(ctx):
-    help_text = '''
-Commands:
-!slots <wager>       - Play the slot machine. Win the jackpot with 3 💰
-!roulette <wager> <color>  - Roulette pick b/w Black, Red, and Green or choose a number & up to three bets using "," as a seperator
-!rps <move>          - Free to play, win 100 tokens!
-!crash               - Start a Crash Game
-!crash <wager>       - Wager on an active Crash Game react with a "🛑" to the multiplier message to exit the game
-!leaderboard         - Display the leaderboard
-!balance             - Check your current token balance
-!daily               - Claim your daily tokens
-!hourly              - Claim your hourly tokens
-!monthly             - Claim your monthly tokens
-!distribution        - Display the winning combinations and multipliers
-!shop                - View available items in the shop
-!buy <item_name>     - Buy an item from the shop
-!inventory           - View your inventory
-!pay <user> <amount> - Give tokens to another user
-!helps               - Display the help menu
-'''
-    await ctx.send(help_text)
-
-@bot.command(name='pay', help='Give tokens to another user: !pay <user> <amount>')
-async def pay(ctx, recipient: discord.Member, amount: int):
-    sender_id = ctx.author.id
-    recipient_id = recipient.id
-
-    sender_balance = await get_balance(sender_id) or 0
-    if sender_balance < amount or amount <= 0:
-        await ctx.send(f"{ctx.author.mention}, you do not have enough tokens to give {amount} tokens.")
-        return
-
-    await subtract_balance(sender_id, amount)
-    await add_balance(recipient_id, amount)
-
-    sender_new_balance = sender_balance - amount
-    recipient_new_balance = await get_balance(recipient_id) or 0
-
-    await ctx.send(f"{ctx.author.mention} has given {recipient.mention} {amount} tokens. "
-                   f"Your new balance is {sender_new_balance} tokens. "
-                   f"{recipient.mention}'s new balance is {recipient_new_balance} tokens.")
-
-winning_combinations = {
-    "💰💰💰": "200x",
-    "💵💵💵": "100x",
-    "🍉🍉🍉": "100x",
-    "🍉🍉💵": "100x",
-    "🔔🔔🔔": "18x",
-    "🔔🔔💵": "18x",
-    "🍑🍑🍑": "14x",
-    "🍑🍑💵": "14x",
-    "🍎🍎🍎": "10x",
-    "🍎🍎💵": "10x",
-}
-
-inventories = {}  # Dictionary to store user inventories
-shop = {  # Dictionary to store available items in the shop
-    "rock": 1000000,
-    "plastic_cup": 100000,
-    "paperclip": 10000,
-}
-
-@bot.command(name="shop", help="View available items in the shop")
-async def view_shop(ctx):
-    shop_text = "Shop items:\n"
-    for item, price in shop.items():
-        shop_text += f"{item}: {price} tokens\n"
-
-    await ctx.send(shop_text)
-
-@bot.command(name="buy", help="Buy an item from the shop: !buy <item_name>")
-async def buy_item(ctx, item_name: str):
-    user_id = ctx.author.id
-    current_balance = await get_balance(user_id) or 0
-
-    if item_name not in shop:
-        await ctx.send(f"{ctx.author.mention}, the item '{item_name}' is not available in the shop.")
-        return
-
-    item_price = shop[item_name]
-    if current_balance < item_price:
-        await ctx.send(f"{ctx.author.mention}, you do not have enough tokens to buy '{item_name}'.")
-        return
-
-    await subtract_balance(user_id, item_price)
-
-    # Update the user's inventory
-    if user_id not in inventories:
-        inventories[user_id] = {}
-
-    if item_name not in inventories[user_id]:
-        inventories[user_id][item_name] = 0
-
-    inventories[user_id][item_name] += 1
-
-    await ctx.send(f"{ctx.author.mention} has bought '{item_name}'. Your new balance is {current_balance - item_price} tokens.")
-
-@bot.command(name="inventory", help="View your inventory", aliases=["inv"])
-async def view_inventory(ctx):
-    user_id = ctx.author.id
-
-    if user_id not in inventories or not inventories[user_id]:
-        await ctx.send(f"{ctx.author.mention}, your inventory is empty.")
-        return
-
-    inventory_text = f"{ctx.author.mention}'s Inventory:\n"
-    for item, quantity in inventories[user_id].items():
-        inventory_text += f"{item}: {quantity}\n"
-
-    await ctx.send(inventory_text)
-
-
-partial_combinations = {
-    "🍒🍒 ANY": "5x",
-    "🍒 ANY ANY": "2x",
-}
-
-@bot.command(name="distribution", help="Display the winning combinations and multipliers", aliases=["dist"])
-async def distribution(ctx):
-    combinations_text = "Winning Combinations:\n"
-
-    for combination, multiplier in winning_combinations.items():
-        combinations_text += f"{combination}: {multiplier}\n"
-
-    combinations_text += "\nPartial Winning Combinations:\n"
-
-    for combination, multiplier in partial_combinations.items():
-        combinations_text += f"{combination}: {multiplier}\n"
-
-    await ctx.send(combinations_text)
-
-async def spin_wheel(ctx):
-    spin_message = await ctx.send("Spinning...")
-    emoji_colors = {
-        "green": "🟢",
-        "red": "🟥",
-        "black": "⬛"
-    }
-    roulette_wheel = ["green"] + ["red", "black"] * 18
-    random.shuffle(roulette_wheel)
-
-    for i in range(10):  # Adjust this value to change the number of spins
-        spin_sequence = [random.choice(roulette_wheel) for _ in range(5)]
-        spin_result = spin_sequence[2]
-        spin_display = "".join([emoji_colors[color] for color in spin_sequence])
-        await spin_message.edit(content=f"{spin_display}")
-        await asyncio.sleep(0.5)  # Adjust this value to change the spin speed
-
-    return spin_result
-
-@bot.command(name="roulette", help="Play roulette. Example: !roulette <wager1> <color1 or number1>, <wager2> <color2 or number2>, <wager3> <color3 or number3>")
-async def roulette(ctx, *args):
-    bet_string = " ".join(args)
-    bet_parts = bet_string.split(",")
-
-    if len(bet_parts) > 3:
-        await ctx.send(f"{ctx.author.mention}, you can only place up to 3 bets!")
-        return
-
-    bet_list = []
-
-    for bet_part in bet_parts:
-        bet_split = bet_part.strip().split()
-        if len(bet_split) != 2:
-            await ctx.send(f"{ctx.author.mention}, invalid bet format! Usage: !roulette <wager1> <color1 or number1>, <wager2> <color2 or number2>, <wager3> <color3 or number3>")
-            return
-        wager, bet = int(bet_split[0]), bet_split[1]
-        bet_list.append((wager, bet))
-
-    user_id = ctx.author.id
-    current_balance = await get_balance(user_id) or 0
-    total_wager = sum(wager for wager, _ in bet_list)
-
-    if current_balance < total_wager or total_wager <= 0:
-        await ctx.send(f'{ctx.author.mention}, you do not have enough tokens to make these wagers!')
-        return
-
-    await subtract_balance(user_id, total_wager)
-
-    emoji_colors = {
-        "green": "🟢",
-        "red": "🟥",
-        "black": "⬛"
-    }
-
-    roulette_wheel = ["green"] + ["red", "black"] * 18
-    random.shuffle(roulette_wheel)
-
-    spin_result = await spin_wheel(ctx)
-
-    def calculate_payout(bet, spin_result):
-        if bet.lower() == "red" and spin_result == "red":
-            return wager * 2
-        elif bet.lower() == "black" and spin_result == "black":
-            return wager * 2
-        elif bet.lower() == "green" and spin_result == "green":
-            return wager * 36
-        elif bet.isdigit() and int(bet) in range(1, 37) and spin_result != "green":
-            if (int(bet) % 2 == 0 and spin_result == "red") or (int(bet) % 2 == 1 and spin_result == "black"):
-                return wager * 36
-        return 0
-
-    payout = calculate_payout(bet, spin_result)
-    new_balance = current_balance - wager + payout
-
-    payouts = []
-
-    for wager, bet in bet_list:
-        payout = calculate_payout(bet, spin_result)
-        payouts.append(payout)
-        new_balance = current_balance - wager + payout
-
-        if payout > 0:
-            await add_balance(user_id, payout)
-            await ctx.send(f"{ctx.author.mention}, the ball landed on {emoji_colors[spin_result]}! You won {payout} tokens on {bet}! Your new balance is {new_balance} tokens.")
-        else:
-            lost_amount = wager
-            await ctx.send(f"{ctx.author.mention}, the ball landed on {emoji_colors[spin_result]}! You lost {lost_amount} tokens on {bet}. Your new balance is {new_balance} tokens.")
-
-
-@bot.command(name="rps", help="Play Rock, Paper, Scissors. Example: !rps rock")
-async def rps(ctx, player_move: str):
-    if player_move.lower() not in ["rock", "paper", "scissors"] or None:
-        await ctx.send(f"{ctx.author.mention}, please choose a valid move: rock, paper, or scissors.")
-        return
-
-    moves = ["rock", "paper", "scissors"]
-    bot_move = random.choice(moves)
-    user_id = ctx.author.id
-
-    winning_moves = {
-        "rock": "scissors",
-        "paper": "rock",
-        "scissors": "paper"
-    }
-
-    if player_move.lower() == bot_move:
-        await ctx.send(f"{ctx.author.mention}, it's a draw! You both chose {player_move}.")
-    elif winning_moves[player_move.lower()] == bot_move:
-        await add_balance(user_id, 100)
-        new_balance = await get_balance(user_id)
-        await ctx.send(f"{ctx.author.mention}, you won! Your move: {player_move}, bot's move: {bot_move}. You've been awarded 100 tokens! Your new balance is {new_balance} tokens.")
-    else:
-        await ctx.send(f"{ctx.author.mention}, you lost. Your move: {player_move}, bot's move: {bot_move}. Better luck next time!")
-
-class CrashGame:
-    def __init__(self, ctx):
-        self.ctx = ctx
-        self.game_in_progress = False
-        self.players = {}
-        self.crash_multiplier = 1.0
-        self.crash_threshold = self.calculate_crash_threshold()
-
-    def calculate_crash_threshold(self):
-        if random.random() < 0.03:
-            return 1.0
-        return random.uniform(1.0, 5.0)
-
-    async def start_game(self):
-        self.game_in_progress = True
-        crash_message = await self.ctx.send("Crash game starting in 15 seconds...")
-        await crash_message.add_reaction("🛑")
-        await self.start_countdown(crash_message)
-
-        while self.crash_multiplier < self.crash_threshold:
-            self.crash_multiplier += 0.05
-            await crash_message.edit(content=f"Crash game: The multiplier is {self.crash_multiplier:.2f}x")
-            await asyncio.sleep(0.1)
-
-        await crash_message.edit(content=f"Crash game: The multiplier crashed at {self.crash_multiplier:.2f}x")
-        for player in self.players.values():
-            if not player.pulled_out:
-                lost_amount = player.wager
-                await self.ctx.send(f"{player.user.mention}, the multiplier crashed! You have lost {lost_amount} tokens.")
-        self.game_in_progress = False
-
-    async def add_player(self, user, wager):
-        if user.id not in self.players:
-            self.players[user.id] = Player(user, wager)
-
-    async def start_countdown(self, crash_message):
-        for i in range(15, 0, -1):
-            await crash_message.edit(content=f"Crash game starting in {i} seconds...")
-            await asyncio.sleep(1)
-
-class Player:
-    def __init__(self, user, wager):
-        self.user = user
-        self.wager = wager
-        self.pulled_out = False
-
-    def pull_out(self):
-        self.pulled_out = True
-
-crash_game = None
-
-@bot.command(name='crash', help='Start a crash game or join an ongoing game with !crash wager <amount>.')
-async def crash(ctx, wager: str = None, amount: int = None):
-    global crash_game
-    if wager is None:
-        if crash_game is not None and crash_game.game_in_progress:
-            await ctx.send("There is already an ongoing crash game. Please wait until the current game is finished.")
-            return
-        crash_game = CrashGame(ctx)
-        await crash_game.start_game()
-    elif wager.lower() == 'wager' and amount is not None:
-        if crash_game is None or not crash_game.game_in_progress:
-            await ctx.send("There is no ongoing crash game. Please start a new game with !crash.")
-            return
-        await crash_game.add_player(ctx.author, amount)
-        await ctx.send(f"{ctx.author.mention}, you have joined the crash game with a wager of {amount} tokens.")
-
-@bot.event
-async def on_reaction_add(reaction, user):
-    if user == bot.user:
-        return
-
-    if reaction.emoji == "🛑":
-        await handle_reaction(reaction, user)
-
-async def handle_reaction(reaction, user):
-    if not crash_game or not crash_game.game_in_progress:
-        return
-
-    if user.id in crash_game.players and crash_game.players[user.id] and not crash_game.players[user.id].pulled_out:
-        player = crash_game.players[user.id]
-        player.pull_out()
-        payout = int(player.wager * crash_game.crash_multiplier)
-        await crash_game.ctx.send(f"{user.mention}, you have pulled out at {crash_game.crash_multiplier:.2f}x! You won {payout} tokens.")
-
-DECK = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * 4
-blackjack_games = {}
-
-def calculate_hand_value(hand):
-    if isinstance(hand[0], list):
-        return [calculate_hand_value(h) for h in hand]
-    value = sum(hand)
-    if value > 21 and 11 in hand:
-        hand[hand.index(11)] = 1
-        value = sum(hand)
-    return value
-
-def is_pair(hand):
-    return len(hand) == 2 and hand[0] == hand[1]
-
-async def check_game_status(user_id):
-    if blackjack_games[user_id]['status'] != 'ongoing':
-        return None
-
-    dealer_hand = blackjack_games[user_id]['dealer_hand']
-    dealer_hand[1] = random.choice(DECK)  # Second card revealed here
-    dealer_value = calculate_hand_value(dealer_hand)
-
-    for hand in blackjack_games[user_id]['hands']:
-        if hand['status'] != 'ended':
-            return None
-
-    game_status = ""
-    for i, hand in enumerate(blackjack_games[user_id]['hands'], start=1):
-        player_value = calculate_hand_value(hand['cards'])
-        if player_value > 21:
-            result = "Dealer WINS!"
-            winnings = -hand['bet']
-        elif dealer_value > 21 or player_value > dealer_value:
-            result = 'You WIN!'
-            winnings = int(hand['bet'] * 2.5)
-            await add_balance(user_id, winnings)
-        elif player_value == dealer_value:
-            result = "It's a DRAW!"
-            winnings = hand['bet']
-            await add_balance(user_id, winnings)
-        else:
-            result = "Dealer WINS!"
-            winnings = -hand['bet']
-
-        game_status += f"Hand {i}: {result} {winnings > 0 and 'Won' or 'Lost'} {abs(winnings)} tokens.\n"
-        game_status += f"Your cards: {hand['cards']} (Total: {player_value}). Dealer's cards: {dealer_hand} (Total: {dealer_value}).\n"
-
-    del blackjack_games[user_id]  # Deleting the game instance
-
-    return game_status
-
-
-@bot.command(name="blackjack", help="Start a game of blackjack.")
-async def blackjack(ctx, bet: int):
-    user_id = str(ctx.author.id)
-    
-    if user_id in blackjack_games and blackjack_games[user_id]['status'] == 'ongoing':
-        await ctx.send("Your current game of blackjack is still ongoing.")
-        return
-
-    current_balance = await get_balance(user_id)
-    if not current_balance or current_balance < bet:
-        await ctx.send("You don't have enough tokens to place this bet.")
-        return
-
-    await subtract_balance(user_id, bet)
-
-    player_hand = [{'cards': [random.choice(DECK) for _ in range(2)], 'bet': bet, 'status': 'ongoing'}]
-    dealer_hand = [random.choice(DECK), "?"]
-
-    blackjack_games[user_id] = {
-        'status': 'ongoing',
-        'hands': player_hand,
-        'dealer_hand': dealer_hand
-    }
-
-    player_value = calculate_hand_value(player_hand[0]['cards'])
-    dealer_value = calculate_hand_value([dealer_hand[0]])
-
-    options = "`!hit`, `!stand`"
-    if is_pair(player_hand[0]['cards']):
-        options += ", `!split`"
-    await ctx.send(f"Your hand: {player_hand[0]['cards']} (Total: {player_value}). Dealer's card: {dealer_hand[0]} (Total: {dealer_value}). Your options: {options}.")
-
-
-@bot.command(name="hit", help="Draw another card.")
-async def blackjack_hit(ctx, hand_index: int = 1):
-    user_id = str(ctx.author.id)
-
-    if user_id not in blackjack_games:
-        await ctx.send("You're not currently in a game of blackjack.")
-        return
-
-    if blackjack_games[user_id]['status'] != 'ongoing':
-        await ctx.send("Your current game of blackjack is not ongoing.")
-        return
-
-    hand = blackjack_games[user_id]['hands'][hand_index - 1]
-    hand['cards'].append(random.choice(DECK))
-
-    player_value = calculate_hand_value(hand['cards'])
-    dealer_value = calculate_hand_value([blackjack_games[user_id]['dealer_hand'][0]])
-
-    if player_value > 21:
-        hand['status'] = 'ended'
-        game_status = await check_game_status(user_id)
-        if game_status:
-            await ctx.send(f"You've busted with hand {hand_index}: {hand['cards']} (Total: {player_value}). {game_status}")
-            return
-        else:
-            await ctx.send(f"You've busted with hand {hand_index}: {hand['cards']} (Total: {player_value}). Dealer's card: {blackjack_games[user_id]['dealer_hand'][0]} (Total: {dealer_value}).")
-            return
-
-    options = "`!hit`, `!stand`"
-    if is_pair(hand['cards']):
-        options += ", `!split`"
-    await ctx.send(f"Your hand {hand_index}: {hand['cards']} (Total: {player_value}). Dealer's card: {blackjack_games[user_id]['dealer_hand'][0]} (Total: {dealer_value}). Your options: {options}.")
-
-@bot.command(name="stand", help="End your turn and let the dealer play")
-async def blackjack_stand(ctx, hand_index: int = 1):
-    user_id = str(ctx.author.id)
-    if user_id not in blackjack_games or blackjack_games[user_id]['status'] != 'ongoing':
-        await ctx.send("You are not currently in a game of blackjack.")
-        return
-
-    if hand_index > len(blackjack_games[user_id]['hands']):
-        await ctx.send("Invalid hand index.")
-        return
-
-    blackjack_games[user_id]['hands'][hand_index - 1]['status'] = 'ended'
-    game_status = await check_game_status(user_id)
-    if game_status:
-        if user_id in blackjack_games:  # Check if the game instance still exists
-            await ctx.send(f"Your hand {hand_index} ended. Dealer's hand: {blackjack_games[user_id]['dealer_hand']} (Total: {calculate_hand_value(blackjack_games[user_id]['dealer_hand'])}). {game_status}")
-        else:
-            await ctx.send(game_status)
-
-
-@bot.command(name="double", help="Double your bet and take exactly one more card.")
-async def blackjack_double(ctx, hand_index: int = 1):
-    user_id = str(ctx.author.id)
-    if user_id not in blackjack_games or blackjack_games[user_id]['status'] != 'ongoing':
-        await ctx.send("You are not currently in a game of blackjack.")
-        return
-
-    if hand_index > len(blackjack_games[user_id]['hands']):
-        await ctx.send("Invalid hand index.")
-        return
-
-    hand = blackjack_games[user_id]['hands'][hand_index - 1]
-    current_balance = await get_balance(user_id)
-    if current_balance < hand['bet']:
-        await ctx.send("You don't have enough tokens to double your bet.")
-        return
-
-    await subtract_balance(user_id, hand['bet'])
-    hand['bet'] *= 2
-    hand['cards'].append(random.choice(DECK))
-
-    player_value = calculate_hand_value(hand['cards'])
-    dealer_value = calculate_hand_value([blackjack_games[user_id]['dealer_hand'][0]])
-
-    if player_value > 21:
-        hand['status'] = 'ended'
-        game_status = await check_game_status(user_id)
-        if game_status:
-            blackjack_games[user_id]['dealer_hand'][1] = random.choice(DECK)
-            await ctx.send(f"You've busted with hand {hand_index}: {hand['cards']} (Total: {player_value}). Dealer's hand: {blackjack_games[user_id]['dealer_hand']} (Total: {calculate_hand_value(blackjack_games[user_id]['dealer_hand'])}). Dealer wins. {game_status}")
-        else:
-            await ctx.send(f"You've busted with hand {hand_index}: {hand['cards']} (Total: {player_value}). Dealer's card: {blackjack_games[user_id]['dealer_hand'][0]} (Total: {dealer_value}).")
-    else:
-        await blackjack_stand(ctx, hand_index)
-
-@bot.command(name="split", help="Split your hand into two if you have a pair.")
-async def blackjack_split(ctx):
-    user_id = str(ctx.author.id)
-    if user_id not in blackjack_games or blackjack_games[user_id]['status'] != 'ongoing':
-        await ctx.send("You're not currently in a game of blackjack.")
-        return
-
-    if len(blackjack_games[user_id]['hands']) != 1:
-        await ctx.send("You can only split on your first turn.")
-        return
-
-    hand = blackjack_games[user_id]['hands'][0]
-    if not is_pair(hand['cards']):
-        await ctx.send("You can only split if your first two cards form a pair.")
-        return
-
-    current_balance = await get_balance(user_id)
-    if current_balance < hand['bet']:
-        await ctx.send("You don't have enough tokens to split your hand.")
-        return
-
-    await subtract_balance(user_id, hand['bet'])
-    new_hand = hand.copy()
-    hand['cards'][1] = random.choice(DECK)
-    new_hand['cards'][0] = random.choice(DECK)  # Draw a new card for the second hand
-    blackjack_games[user_id]['hands'].append(new_hand)
-
-    dealer_value = calculate_hand_value([blackjack_games[user_id]['dealer_hand'][0]])
-    for i, hand in enumerate(blackjack_games[user_id]['hands'], start=1):
-        player_value = calculate_hand_value(hand['cards'])
-        options = "`!hit`, `!stand`"
-        if is_pair(hand['cards']):
-            options += ", `!split`"
-        await ctx.send(f"Your hand {i}: {hand['cards']} (Total: {player_value}). Dealer's card: {blackjack_games[user_id]['dealer_hand'][0]} (Total: {dealer_value}). Your options: {options}.")
-
-@bot.command(name="bet1", help="Place your bet for the first hand after splitting.")
-async def blackjack_bet1(ctx, bet: int):
-    user_id = str(ctx.author.id)
-    if user_id not in blackjack_games or blackjack_games[user_id]['status'] != 'ongoing':
-        await ctx.send("You're not currently in a game of blackjack.")
-        return
-
-    if len(blackjack_games[user_id]['hands']) < 2:
-        await ctx.send("You can only place separate bets after splitting.")
-        return
-
-    current_balance = await get_balance(user_id)
-    if current_balance < bet:
-        await ctx.send("You don't have enough tokens to place this bet.")
-        return
-
-    await subtract_balance(user_id, bet)
-    blackjack_games[user_id]['hands'][0]['bet'] = bet
-
-    await ctx.send(f"You've placed a bet of {bet} tokens for your first hand.")
-
-@bot.command(name="bet2", help="Place your bet for the second hand after splitting.")
-async def blackjack_bet2(ctx, bet: int):
-    user_id = str(ctx.author.id)
-    if user_id not in blackjack_games or blackjack_games[user_id]['status'] != 'ongoing':
-        await ctx.send("You're not currently in a game of blackjack.")
-        return
-
-    if len(blackjack_games[user_id]['hands']) < 2:
-        await ctx.send("You can only place separate bets after splitting.")
-        return
-
-    current_balance = await get_balance(user_id)
-    if current_balance < bet:
-        await ctx.send("You don't have enough tokens to place this bet.")
-        return
-
-    await subtract_balance(user_id, bet)
-    blackjack_games[user_id]['hands'][1]['bet'] = bet
-
-    await ctx.send(f"You've placed a bet of {bet} tokens for your second hand.")
-
-bot.run(TOKEN)
-
-
+import os
+import discord
+import asyncio
+import signal
+import time
+from dotenv import load_dotenv
+from discord.ext import commands
+from discord.ext.commands import CommandOnCooldown
+from datetime import datetime
+from storage import Storage
+from ledger import Ledger, InsufficientFunds, Transaction
+from balance_cache import BalanceCache
+from ledger_service import RemoteLedger
+from rankings import Leaderboard, NameCache
+from rewards import ClaimStore, RemoteClaimStore, format_remaining
+from inventory import Inventory, RemoteInventory, SHOP, SHOP_TEXT
+import slot_engine
+import roulette_engine
+from crash_games import AlreadyJoined, CrashGameManager, GameClosed
+from reactions import ReactionRouter
+from rng_service import RNGService, RPS_MOVES, describe, parse_label
+from round_log import RoundLog
+from rollups import Rollups
+from grants import Grants, Progress, RemoteGrants
+import rtp
+from animation import AnimationScheduler, sequence
+from outbox import Outbox, split_long
+from metrics import Metrics
+from gateway import client_options
+from blackjack_engine import Shoe, calculate_hand_value, dealer_play, is_pair, resolve_hand
+import blackjack_strategy
+from blackjack_sessions import Hand, Session, SessionStore
+
+load_dotenv()
+TOKEN = os.getenv('DISCORD_TOKEN')
+# Set by launch.py when the bot runs as several shard processes.
+SHARD_COUNT = os.getenv('SHARD_COUNT')
+SHARD_IDS = os.getenv('SHARD_IDS')
+LEDGER_SOCKET = os.getenv('LEDGER_SOCKET')
+METRICS_PATH = os.getenv('METRICS_PATH', 'metrics.prom')
+# Trimmed intents and caches for large guilds; see gateway.py.
+LOW_MEMORY = os.getenv('LOW_MEMORY', '').lower() in ('1', 'true', 'yes')
+ROUND_LOG = os.getenv('ROUND_LOG', 'rounds.log')
+
+options = client_options(LOW_MEMORY)
+
+if SHARD_COUNT:
+    shard_ids = [int(shard_id) for shard_id in SHARD_IDS.split(',')] if SHARD_IDS else None
+    bot = commands.AutoShardedBot(command_prefix='!', help_command=None,
+                                  shard_count=int(SHARD_COUNT), shard_ids=shard_ids, **options)
+else:
+    bot = commands.Bot(command_prefix='!', help_command=None, **options)
+storage = Storage('leaderboard.db')
+if LEDGER_SOCKET:
+    # Balances belong to the ledger service; the tables this process writes
+    # itself are shared with the other shard processes, so nothing about
+    # them is cached here.
+    balance_cache = None
+    ledger = RemoteLedger(LEDGER_SOCKET)
+else:
+    balance_cache = BalanceCache(storage, 'balances.journal')
+    ledger = Ledger(storage, balance_cache)
+shared = balance_cache is None
+names = NameCache(bot)
+leaderboard_page = Leaderboard(ledger, storage, names)
+claims = RemoteClaimStore(storage, ledger) if shared else ClaimStore(storage, ledger)
+inventory = RemoteInventory(storage, ledger) if shared else Inventory(storage, ledger)
+rollups = Rollups(storage, ledger)
+grants = RemoteGrants(storage, ledger) if shared else Grants(storage, ledger)
+
+MAX_AUTOSPINS = 1000
+SPIN_SECONDS = 5.0
+animator = AnimationScheduler()
+outbox = Outbox(animator)
+
+metrics = Metrics()
+metrics.instrument(storage, 'storage', ['fetchone', 'fetchall', 'get_balance', 'ranked_balances'])
+metrics.instrument(ledger, 'storage', ['commit', 'commit_bulk'], prefix='ledger.')
+metrics.instrument_http(bot.http)
+if balance_cache is not None:
+    metrics.instrument(balance_cache, 'storage', ['flush'], prefix='balance_cache.')
+    metrics.gauge('balance_cache', balance_cache.metrics)
+metrics.gauge('outbox', lambda: {'posted': outbox.posted, 'batches': outbox.batches})
+rng = RNGService(storage)
+metrics.gauge('rng', rng.metrics)
+round_log = RoundLog(ROUND_LOG)
+metrics.gauge('round_log', round_log.metrics)
+reactions = ReactionRouter()
+crash_games = CrashGameManager(ledger, animator, reactions, rng, round_log, rollups)
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started = time.perf_counter()
+
+@bot.after_invoke
+async def record_command(ctx):
+    metrics.observe('command', ctx.command.qualified_name, time.perf_counter() - ctx.started, ctx.command_failed)
+
+@bot.event
+async def on_user_update(before, after):
+    leaderboard_page.on_user_update(after)
+
+@bot.event
+async def on_command_error(ctx, error):
+    if isinstance(error, CommandOnCooldown):
+        await ctx.send(f'{ctx.author.mention}, you can use this command again in {format_remaining(error.retry_after)}.')
+    elif isinstance(error, commands.MissingPermissions):
+        await ctx.send(f'{ctx.author.mention}, you do not have permission to use this command.')
+    else:
+        raise error
+
+
+@bot.command(name='slots', help='Play the slot machine')
+@outbox.coalesce
+async def slots(ctx, wager: int = None):
+    if wager is None:
+        await ctx.send(f"{ctx.author.mention}, please specify a wager! Usage: !slots <wager>")
+        return
+
+    user_id = ctx.author.id
+
+    if wager <= 0:
+        await ctx.send(f'{ctx.author.mention}, you do not have enough tokens to wager {wager}!')
+        return
+
+    round = await rng.round('slots')
+    grid = slot_engine.spin(round.rng)
+    slot_output = slot_engine.render(grid)
+
+    row = grid[1]
+    payout = slot_engine.payout(row, wager)
+    roll_odds = slot_engine.ODDS[row]
+
+    try:
+        new_balance = await rollups.settle(user_id, 'slots', wager, payout)
+    except InsufficientFunds:
+        await ctx.send(f'{ctx.author.mention}, you do not have enough tokens to wager {wager}!')
+        return
+    round_log.record(user_id, 'slots', wager, payout, slot_engine.row_code(row))
+
+    await ctx.send(slot_output)
+
+    if payout > 0:
+        await ctx.send(f'{ctx.author.mention} has won {payout} tokens! Your new balance is {new_balance} tokens.')
+    else:
+        lost_amount = wager
+        await ctx.send(f'{ctx.author.mention} has lost {lost_amount} tokens. Your new balance is {new_balance} tokens.')
+
+    await ctx.send(f"The odds of this roll were 1 in {1/roll_odds:.2f}. Round {round.label}.")
+
+@bot.command(name='autospin', help='Spin the slot machine several times in one go: !autospin <wager> <count>')
+async def autospin(ctx, wager: int = None, count: int = None):
+    if wager is None or count is None:
+        await ctx.send(f"{ctx.author.mention}, please specify a wager and a number of spins! Usage: !autospin <wager> <count>")
+        return
+
+    if count <= 0 or count > MAX_AUTOSPINS:
+        await ctx.send(f"{ctx.author.mention}, you can auto-spin between 1 and {MAX_AUTOSPINS} times.")
+        return
+
+    if wager <= 0:
+        await ctx.send(f'{ctx.author.mention}, you do not have enough tokens to wager {wager}!')
+        return
+
+    round = await rng.round('autospin')
+    result = slot_engine.autospin(wager, count, round.rng)
+
+    try:
+        new_balance = await rollups.settle(ctx.author.id, 'slots', result.wagered, result.payout, rounds=count,
+                                           biggest_win=result.best_win)
+    except InsufficientFunds:
+        await ctx.send(f'{ctx.author.mention}, you do not have enough tokens to wager {wager} on {count} spins!')
+        return
+    round_log.record(ctx.author.id, 'autospin', result.wagered, result.payout, count)
+
+    best = ''.join(result.best)
+    await ctx.send(f"{ctx.author.mention} spun {count} times at {wager} tokens: {result.wins} winning spins, "
+                   f"best roll {best} ({slot_engine.PAYTABLE[result.best]}x). "
+                   f"Wagered {result.wagered}, won {result.payout}, net {result.net:+d} tokens. "
+                   f"Your new balance is {new_balance} tokens. Round {round.label}.")
+
+@bot.command(name='leaderboard', help='Display the leaderboard: !leaderboard <page>')
+async def leaderboard(ctx, page: int = 1):
+    if page < 1:
+        page = 1
+
+    leaderboard_text = await leaderboard_page.render(page)
+
+    if leaderboard_text is None:
+        if page == 1:
+            await ctx.send('No balances found on the leaderboard.')
+        else:
+            await ctx.send(f'The leaderboard only has {leaderboard_page.page_count()} pages.')
+        return
+
+    await ctx.send(leaderboard_text)
+
+@bot.command(name='rank', help='Show your leaderboard rank and the players around you')
+async def rank(ctx, member: discord.Member = None):
+    member = member or ctx.author
+    # Balances can change while names are resolved, so the rank is the one
+    # the neighbours were listed at, and the count is taken at the same time.
+    players = len(leaderboard_page.index)
+    neighbours = await leaderboard_page.neighbours(member.id)
+
+    if not neighbours:
+        await ctx.send(f'{member.mention} is not on the leaderboard yet.')
+        return
+
+    rank_text = ''
+    for position, user_id, name, balance in neighbours:
+        marker = ''
+        if user_id == member.id:
+            marker, member_rank = ' <--', position
+        rank_text += f'{position}. {name}: {balance}{marker}\n'
+
+    await ctx.send(f'{member.mention} is ranked #{member_rank} of {players} players.\n{rank_text}')
+
+# Add alias for balance command
+@bot.command(name='balance', aliases=['bal'], help='Check your current token balance')
+async def balance(ctx):
+    user_id = ctx.author.id
+    current_balance = await ledger.balance(user_id)
+    await ctx.send(f'{ctx.author.mention}, your current balance is {current_balance} tokens.')
+
+async def claim_reward(ctx, kind):
+    claimed, new_balance, waiting = await claims.claim(ctx.author.id, (kind,))
+    if kind in waiting:
+        await ctx.send(f'{ctx.author.mention}, you can use this command again in {format_remaining(waiting[kind])}.')
+        return
+    await ctx.send(f"{ctx.author.mention} has claimed {claimed[kind]} tokens as their {kind} reward!")
+
+@bot.command(name='daily', help='Claim daily reward')
+async def daily(ctx):
+    await claim_reward(ctx, 'daily')
+
+@bot.command(name='hourly', help='Claim hourly reward')
+async def hourly(ctx):
+    await claim_reward(ctx, 'hourly')
+
+@bot.command(name='monthly', help='Claim monthly reward')
+async def monthly(ctx):
+    await claim_reward(ctx, 'monthly')
+
+@bot.command(name='claim', help='Claim every reward that is ready')
+async def claim(ctx):
+    claimed, new_balance, waiting = await claims.claim(ctx.author.id)
+    lines = []
+    if claimed:
+        rewards = ', '.join(f'{tokens} {kind}' for kind, tokens in claimed.items())
+        lines.append(f"{ctx.author.mention} has claimed {sum(claimed.values())} tokens ({rewards}). Your new balance is {new_balance} tokens.")
+    else:
+        lines.append(f"{ctx.author.mention}, you have no rewards to claim right now.")
+    for kind, seconds_left in waiting.items():
+        lines.append(f"Next {kind} reward in {format_remaining(seconds_left)}.")
+    await ctx.send('\n'.join(lines))
+
+HELP_TEXT = '''
+Commands:
+!slots <wager>       - Play the slot machine. Win the jackpot with 3 💰
+!autospin <wager> <count> - Spin the slot machine up to 1000 times and get one summary
+!roulette <wager> <color>  - Roulette pick b/w Black, Red, and Green or choose a number & up to three bets using "," as a seperator
+!rps <move>          - Free to play, win 100 tokens!
+!crash               - Start a Crash Game
+!crash <wager>       - Wager on an active Crash Game react with a "🛑" to the multiplier message to exit the game
+!hint [hand]         - Show the best play for your blackjack hand and what each option is expected to return
+!leaderboard <page>  - Display the leaderboard
+!rank                - Show your rank and the players around you
+!balance             - Check your current token balance
+!daily               - Claim your daily tokens
+!hourly              - Claim your hourly tokens
+!monthly             - Claim your monthly tokens
+!claim               - Claim every reward that is ready
+!distribution        - Display the winning combinations and multipliers
+!shop                - View available items in the shop
+!buy <item_name> [quantity] - Buy items from the shop
+!inventory           - View your inventory
+!pay <user> <amount> - Give tokens to another user
+!stats [user]        - Show total wagered, net won, biggest win and favorite game
+!fair                - Show the hash chain anchors the games deal from
+!verify <round> [spins] - Reveal a finished round's seed and replay it
+!helps               - Display the help menu
+'''
+
+@bot.command(name='helps', help='Display the help menu')
+async def helps(ctx):
+    await ctx.send(HELP_TEXT)
+
+@bot.command(name='fair', help='Show the hash chain anchors the games deal from')
+async def fair(ctx):
+    lines = ["Every round's seed hashes (SHA-256) to the seed of the round before it, "
+             "and the first round of an epoch to the epoch's anchor. Current anchors:"]
+    for game, epochs in rng.anchors().items():
+        lines.append(f"{game}: " + ", ".join(f"epoch {epoch} `{anchor}`" for epoch, anchor in epochs))
+    await ctx.send("\n".join(lines))
+
+@bot.command(name='verify', help='Reveal a finished round and replay it: !verify <round> [spins]')
+async def verify(ctx, label: str, count: int = None):
+    try:
+        round = await rng.replay(label)
+    except KeyError:
+        await ctx.send(f"{ctx.author.mention}, there is no round {label}.")
+        return
+    except ValueError:
+        await ctx.send(f"{ctx.author.mention}, round {label} is still being played. Try again once it is over.")
+        return
+    await ctx.send(f"Round {round.label} ({round.game})\n"
+                   f"Seed: `{round.seed.hex()}`\n"
+                   f"SHA-256 of the seed: `{round.commitment}`\n"
+                   f"{describe(round, count)}")
+
+@bot.command(name='pay', help='Give tokens to another user: !pay <user> <amount>')
+async def pay(ctx, recipient: discord.Member, amount: int):
+    sender_id = ctx.author.id
+    recipient_id = recipient.id
+
+    if amount <= 0:
+        await ctx.send(f"{ctx.author.mention}, you do not have enough tokens to give {amount} tokens.")
+        return
+
+    try:
+        sender_new_balance, recipient_new_balance = await ledger.transfer(sender_id, recipient_id, amount)
+    except InsufficientFunds:
+        await ctx.send(f"{ctx.author.mention}, you do not have enough tokens to give {amount} tokens.")
+        return
+
+    await ctx.send(f"{ctx.author.mention} has given {recipient.mention} {amount} tokens. "
+                   f"Your new balance is {sender_new_balance} tokens. "
+                   f"{recipient.mention}'s new balance is {recipient_new_balance} tokens.")
+
+@bot.command(name="shop", help="View available items in the shop")
+async def view_shop(ctx):
+    await ctx.send(SHOP_TEXT)
+
+@bot.command(name="buy", help="Buy items from the shop: !buy <item_name> [quantity]")
+async def buy_item(ctx, item_name: str, quantity: int = 1):
+    user_id = ctx.author.id
+
+    if item_name not in SHOP:
+        await ctx.send(f"{ctx.author.mention}, the item '{item_name}' is not available in the shop.")
+        return
+
+    if quantity <= 0:
+        await ctx.send(f"{ctx.author.mention}, please buy at least one '{item_name}'.")
+        return
+
+    try:
+        new_balance, count = await inventory.buy(user_id, item_name, quantity)
+    except InsufficientFunds:
+        await ctx.send(f"{ctx.author.mention}, you do not have enough tokens to buy {quantity} '{item_name}'.")
+        return
+
+    bought = f"'{item_name}'" if quantity == 1 else f"{quantity} '{item_name}'"
+    await ctx.send(f"{ctx.author.mention} has bought {bought}. You now own {count}. Your new balance is {new_balance} tokens.")
+
+@bot.command(name="inventory", help="View your inventory", aliases=["inv"])
+async def view_inventory(ctx):
+    items = await inventory.load(ctx.author.id)
+
+    if not items:
+        await ctx.send(f"{ctx.author.mention}, your inventory is empty.")
+        return
+
+    inventory_text = f"{ctx.author.mention}'s Inventory:\n" + "".join(f"{item}: {quantity}\n" for item, quantity in items.items())
+    await ctx.send(inventory_text)
+
+
+DISTRIBUTION_TEXT = ("Winning Combinations:\n"
+                     + "".join(f"{combination}: {multiplier}\n" for combination, multiplier in slot_engine.winning_combinations.items())
+                     + "\nPartial Winning Combinations:\n"
+                     + "".join(f"{combination}: {multiplier}\n" for combination, multiplier in slot_engine.partial_combinations.items()))
+
+@bot.command(name="distribution", help="Display the winning combinations and multipliers", aliases=["dist"])
+async def distribution(ctx):
+    await ctx.send(DISTRIBUTION_TEXT)
+
+@bot.command(name="metrics", help="Admin: command, storage and Discord API latencies")
+@commands.has_permissions(administrator=True)
+async def show_metrics(ctx):
+    for piece in split_long(metrics.report(), 1990):
+        await ctx.send(f"```\n{piece}\n```")
+
+@bot.command(name="stats", help="Show your totals: wagered, net won, biggest win and favorite game")
+async def stats(ctx, member: discord.Member = None):
+    member = member or ctx.author
+    games = await rollups.player(member.id)
+    if not games:
+        await ctx.send(f"{member.mention} has not played any rounds yet.")
+        return
+    wagered = sum(totals.wagered for totals in games.values())
+    net = sum(totals.net for totals in games.values())
+    biggest = max(totals.biggest_win for totals in games.values())
+    favorite = max(games, key=lambda game: games[game].rounds)
+    rounds = sum(totals.rounds for totals in games.values())
+    await ctx.send(f"{member.mention} has played {rounds} rounds and wagered {wagered} tokens in total. "
+                   f"Net won: {net:+d} tokens. Biggest win: {biggest} tokens. Favorite game: {favorite}.")
+
+@bot.command(name="housestats", help="Admin: rounds, wagers and house profit per game")
+@commands.has_permissions(administrator=True)
+async def housestats(ctx):
+    totals = await rollups.house_totals()
+    if not totals:
+        await ctx.send("No rounds have been played yet.")
+        return
+    lines = [f'{"game":<10} {"rounds":>10} {"wagered":>14} {"paid out":>14} {"house profit":>14}']
+    for game, game_totals in sorted(totals.items()):
+        lines.append(f'{game:<10} {game_totals.rounds:>10} {game_totals.wagered:>14} {game_totals.paid:>14} {-game_totals.net:>14}')
+    await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
+async def run_grant(ctx, amount, user_ids, who, key):
+    # Shared by !grant and !airdrop. Without a key the command message id is
+    # used, so only an explicit key protects a repeated command.
+    if amount <= 0:
+        await ctx.send(f"{ctx.author.mention}, the amount to grant must be positive.")
+        return
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        await ctx.send(f"{ctx.author.mention}, there is nobody to grant tokens to.")
+        return
+    key = key or f"{ctx.command.name}-{ctx.message.id}"
+    message = await ctx.send(f"Granting {amount} tokens to {len(user_ids):,} {who}...")
+
+    async def report(done, total):
+        await message.edit(content=f"Granting {amount} tokens to {len(user_ids):,} {who}... {done:,}/{total:,}")
+
+    progress = Progress(report)
+    started = time.perf_counter()
+    balances = await grants.grant(key, user_ids, amount, ctx.author.id, progress)
+    await progress.wait()
+    if balances is None:
+        granted_amount, recipients, _, granted_at = await grants.find(key)
+        when = datetime.fromtimestamp(granted_at).strftime('%Y-%m-%d %H:%M')
+        await message.edit(content=f"Grant `{key}` was already paid out on {when}: {granted_amount} tokens to "
+                                   f"{recipients:,} players. Nothing was credited.")
+        return
+    await message.edit(content=f"Granted {amount} tokens to {len(balances):,} {who} in "
+                               f"{time.perf_counter() - started:.1f}s. Grant key: `{key}`")
+
+@bot.command(name="grant", help="Admin: credit tokens to members: !grant <amount> <members...> [key]")
+@commands.has_permissions(administrator=True)
+async def grant(ctx, amount: int, members: commands.Greedy[discord.Member], key: str = None):
+    await run_grant(ctx, amount, [member.id for member in members], "members", key)
+
+@bot.command(name="airdrop", help="Admin: credit tokens to a role or the leaderboard: !airdrop <amount> <role|leaderboard> [key]")
+@commands.has_permissions(administrator=True)
+async def airdrop(ctx, amount: int, target: str, key: str = None):
+    if target.lower() == "leaderboard":
+        await run_grant(ctx, amount, list(leaderboard_page.index.balances), "players on the leaderboard", key)
+        return
+    try:
+        role = await commands.RoleConverter().convert(ctx, target)
+    except commands.RoleNotFound:
+        await ctx.send(f"{ctx.author.mention}, there is no role {target}. Use a role or `leaderboard`.")
+        return
+    if not bot.intents.members:
+        await ctx.send(f"{ctx.author.mention}, role airdrops need the member cache, which low-memory mode turns off.")
+        return
+    if not ctx.guild.chunked:
+        await ctx.guild.chunk()
+    await run_grant(ctx, amount, [member.id for member in role.members if not member.bot], f"members of {role.name}", key)
+
+@bot.command(name="rtp", help="Admin: exact return-to-player and variance of the slot machine")
+@commands.has_permissions(administrator=True)
+async def slot_rtp(ctx):
+    await ctx.send(rtp.analyze().format(top=10))
+
+async def spin_wheel(ctx, round):
+    spin_sequences = roulette_engine.spin_frames(roulette_engine.SPIN_FRAMES, round.rng)
+    spin_displays = ["".join([roulette_engine.EMOJI_COLORS[color] for color in spin_sequence]) for spin_sequence in spin_sequences]
+    # The scheduler decides how many of the frames actually get drawn.
+    await animator.play(ctx.channel, ctx.author.display_name, sequence(spin_displays, SPIN_SECONDS), SPIN_SECONDS)
+    return roulette_engine.landed(spin_sequences)
+
+@bot.command(name="roulette", help="Play roulette. Example: !roulette <wager1> <color1 or number1>, <wager2> <color2 or number2>, <wager3> <color3 or number3>")
+@outbox.coalesce
+async def roulette(ctx, *args):
+    bet_string = " ".join(args)
+    bet_parts = bet_string.split(",")
+
+    if len(bet_parts) > 3:
+        await ctx.send(f"{ctx.author.mention}, you can only place up to 3 bets!")
+        return
+
+    bet_list = []
+
+    for bet_part in bet_parts:
+        bet_split = bet_part.strip().split()
+        if len(bet_split) != 2:
+            await ctx.send(f"{ctx.author.mention}, invalid bet format! Usage: !roulette <wager1> <color1 or number1>, <wager2> <color2 or number2>, <wager3> <color3 or number3>")
+            return
+        wager, bet = int(bet_split[0]), bet_split[1]
+        bet_list.append((wager, bet))
+
+    user_id = ctx.author.id
+    total_wager = sum(wager for wager, _ in bet_list)
+
+    if total_wager <= 0 or any(wager < 0 for wager, _ in bet_list):
+        await ctx.send(f'{ctx.author.mention}, you do not have enough tokens to make these wagers!')
+        return
+
+    try:
+        new_balance = await ledger.debit(user_id, total_wager)
+    except InsufficientFunds:
+        await ctx.send(f'{ctx.author.mention}, you do not have enough tokens to make these wagers!')
+        return
+
+    round = await rng.round('roulette')
+    spin_result = await spin_wheel(ctx, round)
+    emoji_colors = roulette_engine.EMOJI_COLORS
+
+    payouts = [roulette_engine.calculate_payout(wager, bet, spin_result) for wager, bet in bet_list]
+
+    # All winning bets are paid out in a single ledger call, which also
+    # records the round.
+    txn = Transaction()
+    if sum(payouts) > 0:
+        txn.credit(user_id, sum(payouts))
+    new_balance = (await rollups.commit(txn, user_id, 'roulette', total_wager, sum(payouts))).get(user_id, new_balance)
+    round_log.record(user_id, 'roulette', total_wager, sum(payouts), list(emoji_colors).index(spin_result))
+
+    for (wager, bet), payout in zip(bet_list, payouts):
+        if payout > 0:
+            await ctx.send(f"{ctx.author.mention}, the ball landed on {emoji_colors[spin_result]}! You won {payout} tokens on {bet}! Your new balance is {new_balance} tokens.")
+        else:
+            lost_amount = wager
+            await ctx.send(f"{ctx.author.mention}, the ball landed on {emoji_colors[spin_result]}! You lost {lost_amount} tokens on {bet}. Your new balance is {new_balance} tokens.")
+    await ctx.send(f"Round {round.label}.")
+
+
+@bot.command(name="rps", help="Play Rock, Paper, Scissors. Example: !rps rock")
+async def rps(ctx, player_move: str):
+    if player_move.lower() not in ["rock", "paper", "scissors"] or None:
+        await ctx.send(f"{ctx.author.mention}, please choose a valid move: rock, paper, or scissors.")
+        return
+
+    round = await rng.round('rps')
+    bot_move = round.rng.choice(RPS_MOVES)
+    user_id = ctx.author.id
+
+    winning_moves = {
+        "rock": "scissors",
+        "paper": "rock",
+        "scissors": "paper"
+    }
+
+    won = winning_moves[player_move.lower()] == bot_move
+    if player_move.lower() == bot_move:
+        await ctx.send(f"{ctx.author.mention}, it's a draw! You both chose {player_move}. Round {round.label}.")
+    elif won:
+        new_balance = await ledger.credit(user_id, 100)
+        await ctx.send(f"{ctx.author.mention}, you won! Your move: {player_move}, bot's move: {bot_move}. You've been awarded 100 tokens! Your new balance is {new_balance} tokens. Round {round.label}.")
+    else:
+        await ctx.send(f"{ctx.author.mention}, you lost. Your move: {player_move}, bot's move: {bot_move}. Better luck next time! Round {round.label}.")
+    round_log.record(user_id, 'rps', 0, 100 if won else 0, RPS_MOVES.index(bot_move))
+
+@bot.command(name='crash', help='Start a crash game or join an ongoing game with !crash wager <amount>.')
+async def crash(ctx, wager: str = None, amount: int = None):
+    crash_game = crash_games.get(ctx.channel.id)
+    if wager is None:
+        if crash_game is not None:
+            await ctx.send("There is already an ongoing crash game in this channel. Please wait until the current game is finished.")
+            return
+        if crash_games.start(ctx) is None:
+            await ctx.send("Too many crash games are running right now. Please try again in a moment.")
+    elif wager.lower() == 'wager' and amount is not None:
+        if crash_game is None or not crash_game.game_in_progress:
+            await ctx.send("There is no ongoing crash game in this channel. Please start a new game with !crash.")
+            return
+        if amount <= 0:
+            await ctx.send(f"{ctx.author.mention}, you do not have enough tokens to wager {amount}!")
+            return
+        try:
+            await crash_game.add_player(ctx.author, amount)
+        except GameClosed:
+            await ctx.send("The multiplier is already rising. Please join the next crash game.")
+            return
+        except AlreadyJoined:
+            await ctx.send(f"{ctx.author.mention}, you have already joined this crash game.")
+            return
+        except InsufficientFunds:
+            await ctx.send(f"{ctx.author.mention}, you do not have enough tokens to wager {amount}!")
+            return
+        await ctx.send(f"{ctx.author.mention}, you have joined the crash game with a wager of {amount} tokens.")
+
+@bot.event
+async def on_raw_reaction_add(payload):
+    await reactions.dispatch(payload)
+
+blackjack_games = SessionStore(storage, ledger, shared=shared)
+shoe = Shoe()
+shoe_round = None
+# Replaced shoes whose rounds are not revealed yet. A shoe's seed gives away
+# its whole card order, dealers' hole cards included, so it stays hidden
+# until no open game, in any process, was dealt from it.
+retired_shoes = {}
+
+async def deal_shoe():
+    # Each shuffle of the shoe is a hidden round of the blackjack stream.
+    global shoe_round
+    if retired_shoes:
+        # Games dealt here may have ended in another process.
+        await reveal_shoes()
+    if shoe_round is not None and not shoe.past_cut():
+        return
+    round = await rng.round('blackjack', hidden=True)
+    previous, shoe_round = shoe_round, round
+    shoe.shuffle(round.rng)
+    if previous is not None:
+        await retire_shoe(previous)
+
+async def retire_shoe(round):
+    retired_shoes[round.label] = round
+    await reveal_shoes()
+
+async def reveal_shoes():
+    for label in list(retired_shoes):
+        if not await blackjack_games.open_on(label):
+            round = retired_shoes.pop(label, None)
+            if round is not None:
+                rng.reveal(round)
+
+async def blackjack_game_ended(label):
+    if label is None:
+        return
+    if label in retired_shoes:
+        await reveal_shoes()
+        return
+    # A game dealt before a restart: its shoe belongs to an epoch of a
+    # process that has closed.
+    epoch, _ = parse_label(label)
+    if epoch not in rng.epochs:
+        held = [parse_label(shoe)[1] for shoe in await blackjack_games.open_shoes() if parse_label(shoe)[0] == epoch]
+        await rng.release(epoch, held)
+
+blackjack_games.subscribe(blackjack_game_ended)
+
+async def check_game_status(session):
+    user_id = session.user_id
+    for hand in session.hands:
+        if not hand.ended:
+            await blackjack_games.save(session)
+            return None
+
+    dealer_hand = session.dealer
+    if dealer_hand[1] == 0:  # Sessions saved before the hole card was dealt up front
+        dealer_hand[1] = shoe.draw()
+    if any(calculate_hand_value(hand.cards) <= 21 for hand in session.hands):
+        dealer_value = dealer_play(dealer_hand, shoe.draw)
+    else:
+        dealer_value = calculate_hand_value(dealer_hand)
+
+    game_status = ""
+    total_payout = 0
+    for i, hand in enumerate(session.hands, start=1):
+        player_value = calculate_hand_value(hand.cards)
+        result, winnings = resolve_hand(player_value, dealer_value, hand.bet)
+        if winnings > 0:
+            total_payout += winnings
+
+        game_status += f"Hand {i}: {result} {winnings > 0 and 'Won' or 'Lost'} {abs(winnings)} tokens.\n"
+        game_status += f"Your cards: {list(hand.cards)} (Total: {player_value}). Dealer's cards: {list(dealer_hand)} (Total: {dealer_value}).\n"
+
+    # The session is gone before the payout, so it cannot be refunded or
+    # settled twice.
+    if not await blackjack_games.delete(user_id):
+        return None
+    txn = Transaction()
+    if total_payout > 0:
+        txn.credit(user_id, total_payout)
+    await rollups.commit(txn, user_id, 'blackjack', session.stake(), total_payout)
+    round_log.record(user_id, 'blackjack', session.stake(), total_payout, dealer_value)
+
+    return game_status
+
+
+@bot.command(name="blackjack", help="Start a game of blackjack.")
+async def blackjack(ctx, bet: int):
+    user_id = ctx.author.id
+    
+    if await blackjack_games.get(user_id) is not None:
+        await ctx.send("Your current game of blackjack is still ongoing.")
+        return
+
+    if bet <= 0:
+        await ctx.send("You don't have enough tokens to place this bet.")
+        return
+
+    try:
+        await ledger.debit(user_id, bet)
+    except InsufficientFunds:
+        await ctx.send("You don't have enough tokens to place this bet.")
+        return
+
+    await deal_shoe()
+    session = Session(user_id, [Hand([shoe.draw(), shoe.draw()], bet)], [shoe.draw(), shoe.draw()], shoe=shoe_round.label)
+    await blackjack_games.save(session)
+    hand = session.hands[0]
+
+    player_value = calculate_hand_value(hand.cards)
+    dealer_value = calculate_hand_value(session.dealer[:1])
+
+    options = "`!hit`, `!stand`"
+    if is_pair(hand.cards):
+        options += ", `!split`"
+    await ctx.send(f"Your hand: {list(hand.cards)} (Total: {player_value}). Dealer's card: {session.dealer[0]} (Total: {dealer_value}). Your options: {options}. Shoe round {shoe_round.label}.")
+
+
+@bot.command(name="hit", help="Draw another card.")
+async def blackjack_hit(ctx, hand_index: int = 1):
+    user_id = ctx.author.id
+    session = await blackjack_games.get(user_id)
+
+    if session is None:
+        await ctx.send("You're not currently in a game of blackjack.")
+        return
+
+    if hand_index > len(session.hands):
+        await ctx.send("Invalid hand index.")
+        return
+
+    hand = session.hands[hand_index - 1]
+    hand.cards.append(shoe.draw())
+
+    player_value = calculate_hand_value(hand.cards)
+    dealer_value = calculate_hand_value(session.dealer[:1])
+
+    if player_value > 21:
+        hand.ended = True
+        game_status = await check_game_status(session)
+        if game_status:
+            await ctx.send(f"You've busted with hand {hand_index}: {list(hand.cards)} (Total: {player_value}). {game_status}")
+            return
+        else:
+            await ctx.send(f"You've busted with hand {hand_index}: {list(hand.cards)} (Total: {player_value}). Dealer's card: {session.dealer[0]} (Total: {dealer_value}).")
+            return
+
+    await blackjack_games.save(session)
+    options = "`!hit`, `!stand`"
+    if is_pair(hand.cards):
+        options += ", `!split`"
+    await ctx.send(f"Your hand {hand_index}: {list(hand.cards)} (Total: {player_value}). Dealer's card: {session.dealer[0]} (Total: {dealer_value}). Your options: {options}.")
+
+@bot.command(name="stand", help="End your turn and let the dealer play")
+async def blackjack_stand(ctx, hand_index: int = 1):
+    user_id = ctx.author.id
+    session = await blackjack_games.get(user_id)
+    if session is None:
+        await ctx.send("You are not currently in a game of blackjack.")
+        return
+
+    if hand_index > len(session.hands):
+        await ctx.send("Invalid hand index.")
+        return
+
+    await stand_hand(ctx, session, hand_index)
+
+async def stand_hand(ctx, session, hand_index):
+    # Takes the session itself: in shared mode get() reads a fresh copy,
+    # which would not have a double's raised bet and extra card.
+    session.hands[hand_index - 1].ended = True
+    game_status = await check_game_status(session)
+    if game_status:
+        await ctx.send(game_status)
+
+
+@bot.command(name="double", help="Double your bet and take exactly one more card.")
+async def blackjack_double(ctx, hand_index: int = 1):
+    user_id = ctx.author.id
+    session = await blackjack_games.get(user_id)
+    if session is None:
+        await ctx.send("You are not currently in a game of blackjack.")
+        return
+
+    if hand_index > len(session.hands):
+        await ctx.send("Invalid hand index.")
+        return
+
+    hand = session.hands[hand_index - 1]
+    try:
+        await ledger.debit(user_id, hand.bet)
+    except InsufficientFunds:
+        await ctx.send("You don't have enough tokens to double your bet.")
+        return
+    hand.bet *= 2
+    hand.cards.append(shoe.draw())
+
+    player_value = calculate_hand_value(hand.cards)
+    dealer_value = calculate_hand_value(session.dealer[:1])
+
+    if player_value > 21:
+        hand.ended = True
+        game_status = await check_game_status(session)
+        if game_status:
+            await ctx.send(f"You've busted with hand {hand_index}: {list(hand.cards)} (Total: {player_value}). Dealer's hand: {list(session.dealer)} (Total: {calculate_hand_value(session.dealer)}). Dealer wins. {game_status}")
+        else:
+            await ctx.send(f"You've busted with hand {hand_index}: {list(hand.cards)} (Total: {player_value}). Dealer's card: {session.dealer[0]} (Total: {dealer_value}).")
+    else:
+        await stand_hand(ctx, session, hand_index)
+
+@bot.command(name="split", help="Split your hand into two if you have a pair.")
+@outbox.coalesce
+async def blackjack_split(ctx):
+    user_id = ctx.author.id
+    session = await blackjack_games.get(user_id)
+    if session is None:
+        await ctx.send("You're not currently in a game of blackjack.")
+        return
+
+    if len(session.hands) != 1:
+        await ctx.send("You can only split on your first turn.")
+        return
+
+    hand = session.hands[0]
+    if not is_pair(hand.cards):
+        await ctx.send("You can only split if your first two cards form a pair.")
+        return
+
+    try:
+        await ledger.debit(user_id, hand.bet)
+    except InsufficientFunds:
+        await ctx.send("You don't have enough tokens to split your hand.")
+        return
+    new_hand = hand.copy()
+    hand.cards[1] = shoe.draw()
+    new_hand.cards[0] = shoe.draw()  # Draw a new card for the second hand
+    session.hands.append(new_hand)
+    await blackjack_games.save(session)
+
+    dealer_value = calculate_hand_value(session.dealer[:1])
+    for i, hand in enumerate(session.hands, start=1):
+        player_value = calculate_hand_value(hand.cards)
+        options = "`!hit`, `!stand`"
+        if is_pair(hand.cards):
+            options += ", `!split`"
+        await ctx.send(f"Your hand {i}: {list(hand.cards)} (Total: {player_value}). Dealer's card: {session.dealer[0]} (Total: {dealer_value}). Your options: {options}.")
+
+@bot.command(name="hint", help="Show the best play for one of your blackjack hands.")
+async def blackjack_hint(ctx, hand_index: int = 1):
+    session = await blackjack_games.get(ctx.author.id)
+    if session is None:
+        await ctx.send("You're not currently in a game of blackjack.")
+        return
+
+    if hand_index > len(session.hands):
+        await ctx.send("Invalid hand index.")
+        return
+
+    hand = session.hands[hand_index - 1]
+    up = session.dealer[0]
+    action, evs = blackjack_strategy.solver().advice(hand.cards, up, can_split=len(session.hands) == 1)
+    returns = ", ".join(f"{name} {ev:+.2f}" for name, ev in evs.items())
+    await ctx.send(f"{ctx.author.mention}, your hand {hand_index}: {list(hand.cards)} (Total: {calculate_hand_value(hand.cards)}) against the dealer's {up}. Best play: `!{action}`. Expected return per token staked: {returns}.")
+
+async def place_split_bet(ctx, index, bet):
+    user_id = ctx.author.id
+    session = await blackjack_games.get(user_id)
+    if session is None:
+        await ctx.send("You're not currently in a game of blackjack.")
+        return False
+
+    if len(session.hands) < 2:
+        await ctx.send("You can only place separate bets after splitting.")
+        return False
+
+    if bet <= 0:
+        await ctx.send("You don't have enough tokens to place this bet.")
+        return False
+
+    try:
+        await ledger.debit(user_id, bet)
+    except InsufficientFunds:
+        await ctx.send("You don't have enough tokens to place this bet.")
+        return False
+    session.hands[index].bet = bet
+    await blackjack_games.save(session)
+    return True
+
+@bot.command(name="bet1", help="Place your bet for the first hand after splitting.")
+async def blackjack_bet1(ctx, bet: int):
+    if await place_split_bet(ctx, 0, bet):
+        await ctx.send(f"You've placed a bet of {bet} tokens for your first hand.")
+
+@bot.command(name="bet2", help="Place your bet for the second hand after splitting.")
+async def blackjack_bet2(ctx, bet: int):
+    if await place_split_bet(ctx, 1, bet):
+        await ctx.send(f"You've placed a bet of {bet} tokens for your second hand.")
+
+async def main():
+    # The storage connection lives exactly as long as the bot does.
+    async with bot:
+        await storage.open()
+        if balance_cache is not None:
+            await balance_cache.start()
+        else:
+            await ledger.connect()
+            await ledger.sync()
+        await leaderboard_page.load()
+        await rng.start()
+        await round_log.start()
+        await blackjack_games.start()
+        exporter = asyncio.create_task(metrics.export_loop(METRICS_PATH))
+        # launch.py stops shard processes with SIGTERM; closing the bot ends
+        # bot.start() so the shutdown below still runs.
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+        try:
+            await bot.start(TOKEN)
+        finally:
+            exporter.cancel()
+            await crash_games.close()
+            await blackjack_games.close()
+            if shoe_round is not None:
+                await retire_shoe(shoe_round)
+            await rng.close()
+            await round_log.close()
+            if balance_cache is not None:
+                await balance_cache.close()
+            else:
+                await ledger.close()
+            await storage.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
+
+
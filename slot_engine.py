@@ -0,0 +1,106 @@
+import random
+from collections import Counter
+from itertools import accumulate, product
+from math import prod
+
+SLOT_ITEMS = ['💰', '💵', '🍉', '🔔', '🍑', '🍎', '🍒']
+WEIGHTS = [1, 3, 2, 1, 7, 5, 2]
+TOTAL_WEIGHT = sum(WEIGHTS)
+CUM_WEIGHTS = list(accumulate(WEIGHTS))
+
+THREE_OF_A_KIND = {'💰': 200, '💵': 100, '🍉': 100, '🔔': 18, '🍑': 14, '🍎': 10}
+TWO_AND_A_BILL = {'🍉': 100, '🔔': 18, '🍑': 14, '🍎': 10}
+
+
+def multiplier(symbols):
+    # The payout rules for one middle row. Only used to build PAYTABLE.
+    first, second, third = symbols
+    if first == second == third and first in THREE_OF_A_KIND:
+        return THREE_OF_A_KIND[first]
+    if first == second and third == '💵' and first in TWO_AND_A_BILL:
+        return TWO_AND_A_BILL[first]
+    if first == second == '🍒':
+        return 5
+    if first == '🍒' and second != third:
+        return 2
+    return 0
+
+
+# Every possible middle row, keyed by its symbol tuple.
+PAYTABLE = {row: multiplier(row) for row in product(SLOT_ITEMS, repeat=3)}
+SYMBOL_ODDS = {symbol: weight / TOTAL_WEIGHT for symbol, weight in zip(SLOT_ITEMS, WEIGHTS)}
+ODDS = {row: prod(SYMBOL_ODDS[symbol] for symbol in row) for row in PAYTABLE}
+
+# What !distribution shows players. rtp.check_display() compares it with PAYTABLE.
+winning_combinations = {
+    "💰💰💰": "200x",
+    "💵💵💵": "100x",
+    "🍉🍉🍉": "100x",
+    "🍉🍉💵": "100x",
+    "🔔🔔🔔": "18x",
+    "🔔🔔💵": "18x",
+    "🍑🍑🍑": "14x",
+    "🍑🍑💵": "14x",
+    "🍎🍎🍎": "10x",
+    "🍎🍎💵": "10x",
+}
+
+partial_combinations = {
+    "🍒🍒 ANY": "5x",
+    "🍒 ANY ANY": "2x",
+}
+
+
+def spin(rng=random):
+    symbols = rng.choices(SLOT_ITEMS, cum_weights=CUM_WEIGHTS, k=9)
+    return [tuple(symbols[0:3]), tuple(symbols[3:6]), tuple(symbols[6:9])]
+
+
+def row_code(row):
+    # The middle row as one number, for the round log.
+    first, second, third = (SLOT_ITEMS.index(symbol) for symbol in row)
+    return 49 * first + 7 * second + third
+
+
+def payout(row, wager):
+    return PAYTABLE[row] * wager
+
+
+def render(grid):
+    return f'''
+-====:|$|:====-
+[{grid[0][0]} : {grid[0][1]} : {grid[0][2]}]
+[{grid[1][0]} : {grid[1][1]} : {grid[1][2]}]
+[{grid[2][0]} : {grid[2][1]} : {grid[2][2]}]
+'''
+
+
+def spin_rows(count, rng=random):
+    # Only the middle row decides the payout, so a batch of spins is one draw
+    # of 3 * count symbols tallied per row.
+    symbols = rng.choices(SLOT_ITEMS, cum_weights=CUM_WEIGHTS, k=3 * count)
+    return Counter(zip(symbols[0::3], symbols[1::3], symbols[2::3]))
+
+
+class AutospinResult:
+    def __init__(self, wager, count, rows):
+        self.wager = wager
+        self.count = count
+        self.rows = rows
+        self.wagered = wager * count
+        self.payout = sum(PAYTABLE[row] * hits for row, hits in rows.items()) * wager
+        self.wins = sum(hits for row, hits in rows.items() if PAYTABLE[row])
+        self.best = max(rows, key=PAYTABLE.__getitem__)
+
+    @property
+    def net(self):
+        return self.payout - self.wagered
+
+    @property
+    def best_win(self):
+        # Net result of the best single spin.
+        return PAYTABLE[self.best] * self.wager - self.wager
+
+
+def autospin(wager, count, rng=random):
+    return AutospinResult(wager, count, spin_rows(count, rng))
@@ -0,0 +1,43 @@
+import asyncio
+import aiosqlite
+
+import migrations
+
+
+class Storage:
+    # Owns the single aiosqlite connection used by the bot for its whole lifetime.
+    # aiosqlite runs every statement on one worker thread per connection, so
+    # sharing the connection also serializes access to the database file.
+
+    def __init__(self, path):
+        self.path = path
+        self.db = None
+        self.lock = asyncio.Lock()
+
+    async def open(self):
+        if self.db is not None:
+            return
+        self.db = await aiosqlite.connect(self.path)
+        await migrations.configure(self.db)
+        await migrations.migrate(self.db)
+
+    async def close(self):
+        if self.db is None:
+            return
+        await self.db.close()
+        self.db = None
+
+    async def fetchone(self, sql, params=()):
+        async with self.db.execute(sql, params) as cursor:
+            return await cursor.fetchone()
+
+    async def fetchall(self, sql, params=()):
+        async with self.db.execute(sql, params) as cursor:
+            return await cursor.fetchall()
+
+    async def get_balance(self, user_id: int):
+        result = await self.fetchone('SELECT balance FROM balances WHERE user_id = ?', (user_id,))
+        return result[0] if result else None
+
+    async def ranked_balances(self):
+        return await self.fetchall('SELECT user_id, balance FROM balances WHERE balance > 0 ORDER BY balance DESC')